@@ -1,23 +1,174 @@
-from typing import Any, Dict, Optional
+from typing import Any, Dict, List, Optional, Tuple, Union
 
 from langchain.tools import BaseTool
 from langchain.agents.agent import AgentExecutor
 from langchain.agents.conversational.base import ConversationalAgent
 from langchain.callbacks.base import BaseCallbackManager
+from langchain.callbacks.manager import Callbacks
 from langchain.chains.llm import LLMChain
 from langchain.memory import ReadOnlySharedMemory
+from langchain.schema import AgentAction, AgentFinish
 from langchain.schema.language_model import BaseLanguageModel
+from pydantic import Field
 
 from config import config
 from tools.human.tool import HumanTool
 from tools.reasoning.tool import ShowReasoningTool, HideReasoningTool
+from agent.executor import ParallelAgentExecutor
+from agent import observation, render
 from agent.output_parser import OutputParser
+from agent.router import ToolRouter
 from agent.prompt import (
     AGENT_PROMPT_PREFIX,
     FORMAT_INSTRUCTIONS_TEMPLATE,
+    PARALLEL_ACTIONS_INSTRUCTIONS,
 )
 
 
+# Max number of prompts kept for routed tool sets.
+MAX_ROUTED_PROMPTS = 32
+
+
+class MultiActionConversationalAgent(ConversationalAgent):
+    """Conversational agent that may take multiple actions in one step. With
+    a tool router, each prompt only describes the tools routed to. With
+    render_output, outputs of some tools are rendered for the user locally
+    instead of being rewritten by the LLM."""
+
+    tool_router: Optional[ToolRouter] = None
+    render_output: bool = False
+    format_instructions: str = ""
+    routed_chains: Dict[Tuple[str, ...], LLMChain] = Field(
+        default_factory=dict
+    )
+
+    class Config:
+        arbitrary_types_allowed = True
+
+    def plan(
+        self,
+        intermediate_steps: List[Tuple[AgentAction, str]],
+        callbacks: Callbacks = None,
+        **kwargs: Any,
+    ) -> Union[AgentAction, List[AgentAction], AgentFinish]:
+        if self.tool_router is None:
+            output = super().plan(intermediate_steps, callbacks, **kwargs)
+        else:
+            output = self._routed_plan(intermediate_steps, callbacks, **kwargs)
+        if self.render_output:
+            output = self._show_rendered(output, intermediate_steps)
+        return output
+
+    def _routed_plan(
+        self,
+        intermediate_steps: List[Tuple[AgentAction, str]],
+        callbacks: Callbacks = None,
+        **kwargs: Any,
+    ) -> Union[AgentAction, List[AgentAction], AgentFinish]:
+        # Route by the query and the latest step. Used tools stay.
+        query = kwargs.get("input", "")
+        if intermediate_steps:
+            query += "\n" + intermediate_steps[-1][0].log
+        tools = self.tool_router.select(
+            query, used={action.tool for action, _ in intermediate_steps}
+        )
+        full_inputs = self.get_full_inputs(intermediate_steps, **kwargs)
+        full_output = self.routed_chain(tools).predict(
+            callbacks=callbacks, **full_inputs
+        )
+        return self.output_parser.parse(full_output)
+
+    def _show_rendered(
+        self,
+        output: Union[AgentAction, List[AgentAction], AgentFinish],
+        intermediate_steps: List[Tuple[AgentAction, str]],
+    ) -> Union[AgentAction, List[AgentAction], AgentFinish]:
+        """Replace the show marker in a response with the rendered output
+        of the latest action. Other responses are left as they are."""
+        if not isinstance(output, AgentFinish) or not intermediate_steps:
+            return output
+        response = output.return_values.get("output", "")
+        if render.SHOW_MARKER not in response:
+            return output
+        # The hint is only given after a single action that renders.
+        action, result = intermediate_steps[-1]
+        if (
+            len(intermediate_steps) > 1
+            and intermediate_steps[-2][0].log is action.log
+        ):
+            return output
+        rendered = render.render(action.tool, str(result))
+        if rendered is None:
+            return output
+        return AgentFinish(
+            {"output": response.replace(render.SHOW_MARKER, rendered)},
+            output.log,
+        )
+
+    def routed_chain(self, tools: List[BaseTool]) -> LLMChain:
+        """Get the chain with a prompt of the tools, cached per tool set."""
+        key = tuple(tool.name for tool in tools)
+        chain = self.routed_chains.get(key)
+        if chain is not None:
+            return chain
+
+        prompt = self.create_prompt(
+            tools,
+            prefix=AGENT_PROMPT_PREFIX,
+            format_instructions=self.format_instructions,
+        )
+        chain = LLMChain(
+            llm=self.llm_chain.llm,
+            prompt=prompt,
+            verbose=self.llm_chain.verbose,
+        )
+        if len(self.routed_chains) >= MAX_ROUTED_PROMPTS:
+            del self.routed_chains[next(iter(self.routed_chains))]
+        self.routed_chains[key] = chain
+        return chain
+
+    def _construct_scratchpad(
+        self, intermediate_steps: List[Tuple[AgentAction, str]]
+    ) -> str:
+        # Actions of one step share the log. Write it once, followed by the
+        # observations of all the actions.
+        thoughts = ""
+        i = 0
+        while i < len(intermediate_steps):
+            log = intermediate_steps[i][0].log
+            step = [intermediate_steps[i]]
+            i += 1
+            while (
+                i < len(intermediate_steps)
+                and intermediate_steps[i][0].log is log
+            ):
+                step.append(intermediate_steps[i])
+                i += 1
+
+            thoughts += log
+            if len(step) == 1:
+                thoughts += (
+                    f"\n{self.observation_prefix}"
+                    f"{observation.encode(str(step[0][1]))}"
+                )
+                # Only the latest output can be shown as rendered.
+                hint = None
+                if self.render_output and i == len(intermediate_steps):
+                    hint = render.show_hint(
+                        step[0][0].tool, str(step[0][1]), self.ai_prefix
+                    )
+                if hint:
+                    thoughts += f"\n{hint}"
+            else:
+                for action, output in step:
+                    thoughts += (
+                        f"\n{self.observation_prefix}[{action.tool}] "
+                        f"{observation.encode(str(output))}"
+                    )
+            thoughts += f"\n{self.llm_prefix}"
+        return thoughts
+
+
 def create_agent(
     llm: BaseLanguageModel,
     shared_memory: Optional[ReadOnlySharedMemory] = None,
@@ -40,22 +191,41 @@ def create_agent(
     format_instructions = FORMAT_INSTRUCTIONS_TEMPLATE.format(
         natural_language=config.APPILOT_CONFIG.natural_language
     )
+    if config.APPILOT_CONFIG.parallel_actions:
+        format_instructions += PARALLEL_ACTIONS_INSTRUCTIONS
     prompt = ConversationalAgent.create_prompt(
         tools,
         prefix=AGENT_PROMPT_PREFIX,
         format_instructions=format_instructions,
     )
 
-    agent = ConversationalAgent(
+    tool_router = None
+    if config.APPILOT_CONFIG.tool_routing:
+        tool_router = ToolRouter(
+            tools,
+            always_on=[tool.name for tool in system_tools],
+            top_k=config.APPILOT_CONFIG.tool_routing_top_k,
+        )
+
+    agent = MultiActionConversationalAgent(
         llm_chain=LLMChain(
             llm=llm, prompt=prompt, verbose=config.APPILOT_CONFIG.verbose
         ),
-        output_parser=OutputParser(),
+        output_parser=OutputParser(
+            multiple_actions=config.APPILOT_CONFIG.parallel_actions
+        ),
         allowed_tools=[tool.name for tool in tools],
+        tool_router=tool_router,
+        render_output=config.APPILOT_CONFIG.render_output,
+        format_instructions=format_instructions,
         **kwargs,
     )
 
-    return AgentExecutor.from_agent_and_tools(
+    if config.APPILOT_CONFIG.parallel_actions:
+        executor_class = ParallelAgentExecutor
+    else:
+        executor_class = AgentExecutor
+    return executor_class.from_agent_and_tools(
         agent=agent,
         tools=tools,
         memory=shared_memory,
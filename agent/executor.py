@@ -0,0 +1,182 @@
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple, Union
+
+from langchain.agents.agent import AgentExecutor, ExceptionTool
+from langchain.agents.tools import InvalidTool
+from langchain.callbacks.manager import CallbackManagerForChainRun
+from langchain.schema import (
+    AgentAction,
+    AgentFinish,
+    OutputParserException,
+)
+from langchain.tools import BaseTool
+
+from tools.base.tools import RequireApprovalTool
+from tools.human.tool import HumanTool
+
+
+def is_concurrent_safe(tool: Optional[BaseTool]) -> bool:
+    """Whether a tool can run along with others. Tools that change things,
+    interact with users or return directly run alone."""
+    if tool is None:
+        return True
+    return not (
+        isinstance(tool, (RequireApprovalTool, HumanTool))
+        or tool.return_direct
+    )
+
+
+class ParallelAgentExecutor(AgentExecutor):
+    """Agent executor that runs the actions of one step concurrently when
+    the tools allow. Other actions run one at a time, in order."""
+
+    max_workers: int = 4
+
+    def _take_next_step(
+        self,
+        name_to_tool_map: Dict[str, BaseTool],
+        color_mapping: Dict[str, str],
+        inputs: Dict[str, str],
+        intermediate_steps: List[Tuple[AgentAction, str]],
+        run_manager: Optional[CallbackManagerForChainRun] = None,
+    ) -> Union[AgentFinish, List[Tuple[AgentAction, str]]]:
+        try:
+            intermediate_steps = self._prepare_intermediate_steps(
+                intermediate_steps
+            )
+            output = self.agent.plan(
+                intermediate_steps,
+                callbacks=run_manager.get_child() if run_manager else None,
+                **inputs,
+            )
+        except OutputParserException as e:
+            return [self._handle_parsing_error(e, run_manager)]
+        if isinstance(output, AgentFinish):
+            return output
+        if isinstance(output, AgentAction):
+            actions = [output]
+        else:
+            actions = output
+        actions = self._split_return_direct(actions, name_to_tool_map)
+
+        for action in actions:
+            if run_manager:
+                run_manager.on_agent_action(action, color="green")
+
+        # Batch consecutive actions that are safe to run together.
+        batches = []
+        for action in actions:
+            safe = is_concurrent_safe(name_to_tool_map.get(action.tool))
+            if safe and batches and batches[-1][0]:
+                batches[-1][1].append(action)
+            else:
+                batches.append((safe, [action]))
+
+        result = []
+        for _, batch in batches:
+            if len(batch) == 1:
+                observations = [
+                    self._run_action(
+                        batch[0], name_to_tool_map, color_mapping, run_manager
+                    )
+                ]
+            else:
+                with ThreadPoolExecutor(
+                    max_workers=min(self.max_workers, len(batch))
+                ) as executor:
+                    observations = list(
+                        executor.map(
+                            lambda action: self._run_action(
+                                action,
+                                name_to_tool_map,
+                                color_mapping,
+                                run_manager,
+                            ),
+                            batch,
+                        )
+                    )
+            result.extend(zip(batch, observations))
+        return result
+
+    def _split_return_direct(
+        self,
+        actions: List[AgentAction],
+        name_to_tool_map: Dict[str, BaseTool],
+    ) -> List[AgentAction]:
+        """Get the actions to run in this step. The executor only returns
+        directly on a single result, so a return direct action runs alone.
+        Actions before it run first and it is left to a later step, so no
+        result of an action that ran is dropped."""
+        for i, action in enumerate(actions):
+            tool = name_to_tool_map.get(action.tool)
+            if tool is not None and tool.return_direct:
+                return [action] if i == 0 else actions[:i]
+        return actions
+
+    def _handle_parsing_error(
+        self,
+        e: OutputParserException,
+        run_manager: Optional[CallbackManagerForChainRun] = None,
+    ) -> Tuple[AgentAction, str]:
+        """Turn an output parsing error into an observation, the same way
+        the base executor does."""
+        if isinstance(self.handle_parsing_errors, bool):
+            if not self.handle_parsing_errors:
+                raise e
+            if e.send_to_llm:
+                observation = str(e.observation)
+                text = str(e.llm_output)
+            else:
+                observation = "Invalid or incomplete response"
+                text = str(e)
+        elif isinstance(self.handle_parsing_errors, str):
+            observation = self.handle_parsing_errors
+            text = str(e)
+        elif callable(self.handle_parsing_errors):
+            observation = self.handle_parsing_errors(e)
+            text = str(e)
+        else:
+            raise ValueError("Got unexpected type of `handle_parsing_errors`")
+        action = AgentAction("_Exception", observation, text)
+        if run_manager:
+            run_manager.on_agent_action(action, color="green")
+        observation = ExceptionTool().run(
+            action.tool_input,
+            verbose=self.verbose,
+            color=None,
+            callbacks=run_manager.get_child() if run_manager else None,
+            **self.agent.tool_run_logging_kwargs(),
+        )
+        return action, observation
+
+    def _run_action(
+        self,
+        action: AgentAction,
+        name_to_tool_map: Dict[str, BaseTool],
+        color_mapping: Dict[str, str],
+        run_manager: Optional[CallbackManagerForChainRun] = None,
+    ) -> str:
+        tool_run_kwargs = self.agent.tool_run_logging_kwargs()
+        callbacks = run_manager.get_child() if run_manager else None
+        if action.tool not in name_to_tool_map:
+            return InvalidTool().run(
+                {
+                    "requested_tool_name": action.tool,
+                    "available_tool_names": list(name_to_tool_map.keys()),
+                },
+                verbose=self.verbose,
+                color=None,
+                callbacks=callbacks,
+                **tool_run_kwargs,
+            )
+
+        tool = name_to_tool_map[action.tool]
+        if tool.return_direct:
+            tool_run_kwargs["llm_prefix"] = ""
+        return tool.run(
+            action.tool_input,
+            verbose=self.verbose,
+            color=color_mapping[action.tool],
+            callbacks=callbacks,
+            **tool_run_kwargs,
+        )
@@ -0,0 +1,77 @@
+import json
+import re
+from typing import Callable, Dict, Iterable, Optional, Sequence, Tuple, Union
+
+from langchain.tools import BaseTool
+
+from agent import render
+from tools.base.tools import RequireApprovalTool
+from tools.human.tool import HumanTool
+from utils import utils
+
+
+class Intent:
+    """A query pattern answered by a tool. The input builder gets the match
+    and returns the tool input, or None when the match is not confident,
+    e.g. for an unknown resource kind."""
+
+    def __init__(
+        self,
+        pattern: str,
+        tool_name: str,
+        build_input: Callable[[re.Match], Optional[Union[str, dict]]],
+    ):
+        self.pattern = re.compile(pattern)
+        self.tool_name = tool_name
+        self.build_input = build_input
+
+
+def normalize(query: str) -> str:
+    return " ".join(query.lower().split()).rstrip(".?!")
+
+
+def is_read_only(tool: BaseTool) -> bool:
+    return not isinstance(tool, (RequireApprovalTool, HumanTool))
+
+
+class FastPath:
+    """Match formulaic queries against intents and answer them by calling
+    the tool directly, without the agent. Only read-only tools are called.
+    Queries matching no intent confidently are left to the agent."""
+
+    def __init__(self, intents: Iterable[Intent], tools: Sequence[BaseTool]):
+        self.tools: Dict[str, BaseTool] = {
+            tool.name: tool for tool in tools if is_read_only(tool)
+        }
+        self.intents = [
+            intent for intent in intents if intent.tool_name in self.tools
+        ]
+
+    def match(self, query: str) -> Optional[Tuple[BaseTool, str]]:
+        """Get the tool and its input for the query, or None."""
+        query = normalize(query)
+        for intent in self.intents:
+            match = intent.pattern.fullmatch(query)
+            if match is None:
+                continue
+            tool_input = intent.build_input(match)
+            if tool_input is None:
+                continue
+            if not isinstance(tool_input, str):
+                tool_input = json.dumps(tool_input)
+            return self.tools[intent.tool_name], tool_input
+        return None
+
+    def run(self, tool: BaseTool, tool_input: str) -> str:
+        """Run the tool and format its output as a response."""
+        output = str(tool.run(tool_input))
+        rendered = render.render(tool.name, output)
+        if rendered is not None:
+            return rendered
+        if output.startswith((utils.raw_format_prefix, "```")):
+            return output
+        try:
+            json.loads(output)
+        except ValueError:
+            return output
+        return f"```json\n{output}\n```"
@@ -0,0 +1,94 @@
+import json
+import re
+from typing import Any, Iterator, List, Optional
+
+from langchain.callbacks.manager import CallbackManagerForLLMRun
+from langchain.chat_models import ChatOpenAI
+from langchain.schema.messages import BaseMessage
+from langchain.schema.output import ChatGenerationChunk
+
+from config import config
+
+_action_input_pattern = re.compile(r"Action: .*?\n*Action Input: *", re.DOTALL)
+_reason_pattern = re.compile(r"\nReason:[^\n]*\n")
+
+
+def action_input_end(text: str) -> int:
+    """Get the end position of a complete action input in the text, or -1
+    if the action or its input is not complete yet."""
+    match = _action_input_pattern.search(text)
+    if match is None:
+        return -1
+    start = match.end()
+    action_input = text[start:]
+    if action_input[:1] in ("{", "["):
+        try:
+            _, end = json.JSONDecoder().raw_decode(action_input)
+        except json.JSONDecodeError:
+            return -1
+        return start + end
+    if action_input.startswith("```"):
+        end = action_input.find("```", 3)
+        return -1 if end < 0 else start + end + 3
+    end = action_input.find("\n")
+    return -1 if end < 0 else start + end
+
+
+def step_end(text: str, wait_reason: bool = False) -> int:
+    """Get the end position of an agent step in the text that is complete
+    enough to act on, or -1 if there is none yet. With wait_reason, the
+    step ends after the Reason line following the action input."""
+    if "AI:" in text:
+        return -1
+    end = action_input_end(text)
+    if end < 0 or not wait_reason:
+        return end
+    match = _reason_pattern.search(text, end)
+    return -1 if match is None else match.end()
+
+
+def is_action_complete(text: str, wait_reason: bool = False) -> bool:
+    """Whether an agent step in the text is complete enough to act on.
+    With wait_reason, the Reason line after the action input is waited
+    for as well."""
+    return step_end(text, wait_reason) >= 0
+
+
+class ActionStreamingChatOpenAI(ChatOpenAI):
+    """ChatOpenAI that stops generating once the agent step is complete,
+    instead of waiting for the tokens the model writes after it. The Reason
+    line is waited for only when it is needed."""
+
+    def _stream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> Iterator[ChatGenerationChunk]:
+        # More actions may follow in parallel mode. The Reason line ends
+        # the step.
+        wait_reason = (
+            config.APPILOT_CONFIG.show_reasoning
+            or config.APPILOT_CONFIG.parallel_actions
+        )
+        text = ""
+        for chunk in super()._stream(messages, stop, run_manager, **kwargs):
+            content = chunk.message.content
+            end = step_end(text + content, wait_reason)
+            if end < 0:
+                text += content
+                yield chunk
+                continue
+
+            # Text after the step in the chunk, e.g. the start of the next
+            # line, would be parsed as part of the action input.
+            content = content[: max(end - len(text), 0)]
+            yield ChatGenerationChunk(
+                message=chunk.message.__class__(content=content),
+                generation_info=chunk.generation_info,
+            )
+            # The parent reports the token after the chunk is taken.
+            if run_manager:
+                run_manager.on_llm_new_token(content)
+            return
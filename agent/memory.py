@@ -0,0 +1,293 @@
+import json
+import re
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+from langchain.callbacks.base import BaseCallbackHandler
+from langchain.memory.utils import get_prompt_input_key
+from langchain.schema import AgentAction, BaseMemory
+from pydantic import Field
+
+from utils import utils
+
+# Kinds of names pinned as facts.
+FACT_KINDS = (
+    "context",
+    "project",
+    "environment",
+    "namespace",
+    "service",
+    "deployment",
+    "pod",
+    "template",
+)
+# Number of latest names kept per kind.
+FACT_VALUES = 3
+# Keys of tool inputs whose values are names of a kind.
+INPUT_FACT_KEYS = {
+    "namespace": "namespace",
+    "environment": "environment",
+    "environment_a": "environment",
+    "environment_b": "environment",
+    "original_environment_name": "environment",
+    "target_environment_name": "environment",
+    "service_name": "service",
+    "related_template_name": "template",
+}
+
+_value = r"[`'\"]?([A-Za-z0-9][\w.-]*[A-Za-z0-9])[`'\"]?"
+_stop_words = {
+    "a",
+    "an",
+    "and",
+    "are",
+    "for",
+    "in",
+    "is",
+    "it",
+    "named",
+    "of",
+    "or",
+    "that",
+    "the",
+    "this",
+    "to",
+    "with",
+}
+
+
+def _fact_patterns(kind: str) -> List[re.Pattern]:
+    return [
+        # namespace: default, namespace "default", namespace named default
+        re.compile(
+            rf"\b{kind}s?"
+            r"(?:\s*[:=]\s*|\s+(?:named|called)\s+|\s+(?=[`'\"]))" + _value,
+            re.IGNORECASE,
+        ),
+        # in namespace default
+        re.compile(rf"\bin\s+{kind}\s+{_value}", re.IGNORECASE),
+        # the default namespace, `default` namespace
+        re.compile(
+            rf"(?:\bthe\s+|[`'\"](?=\S+[`'\"]\s)){_value}\s+{kind}\b",
+            re.IGNORECASE,
+        ),
+    ]
+
+
+_patterns = {kind: _fact_patterns(kind) for kind in FACT_KINDS}
+
+
+_identifier = re.compile(r"[-_.\d]")
+
+
+def extract_facts(
+    text: str, known: Set[str] = frozenset()
+) -> List[Tuple[str, str]]:
+    """Find (kind, name) pairs like "namespace: my-app" in the text. Only
+    identifier-shaped names, or known ones, are taken, so that words like
+    "the new environment" are not."""
+    facts = []
+    for kind, patterns in _patterns.items():
+        for pattern in patterns:
+            for match in pattern.finditer(text):
+                value = match.group(1)
+                if value.lower() in _stop_words:
+                    continue
+                if value in known or _identifier.search(value):
+                    facts.append((kind, value))
+    return facts
+
+
+def input_facts(tool: str, tool_input: Any) -> List[Tuple[str, str]]:
+    """Get (kind, name) pairs from a JSON tool input."""
+    if isinstance(tool_input, str):
+        try:
+            tool_input = json.loads(tool_input)
+        except ValueError:
+            return []
+    if not isinstance(tool_input, dict):
+        return []
+
+    facts = []
+    for key, kind in INPUT_FACT_KEYS.items():
+        value = tool_input.get(key)
+        if isinstance(value, str) and value and not value.startswith("-"):
+            facts.append((kind, value))
+    # The kind of a name is the resource kind, or the pod of pod tools.
+    name = tool_input.get("name")
+    kind = str(tool_input.get("resource_kind", "")).lower().rstrip("s")
+    if kind == "" and "pod" in tool:
+        kind = "pod"
+    if isinstance(name, str) and name and kind in FACT_KINDS:
+        facts.append((kind, name))
+    return facts
+
+
+def clip(text: str, limit: int) -> str:
+    text = " ".join(text.split())
+    if len(text) <= limit:
+        return text
+    return text[: limit - 3] + "..."
+
+
+def summarize_turn(human: str, ai: str) -> str:
+    """Compress a turn into one line, keeping the start of both sides.
+    Markdown tables and code in the response are skipped."""
+    lines = [
+        line
+        for line in ai.splitlines()
+        if line.strip() and not line.lstrip().startswith(("|", "```"))
+    ]
+    response = lines[0] if lines else ""
+    return f"- Human: {clip(human, 100)} | AI: {clip(response, 140)}"
+
+
+class TokenBudgetMemory(BaseMemory):
+    """Conversation memory within a token budget. Latest turns are kept
+    verbatim. Older turns are folded into a summary of one line per turn,
+    and the oldest summary lines are dropped when the summary runs out of
+    its share of the budget. Names seen in the conversation are pinned."""
+
+    memory_key: str = "chat_history"
+    human_prefix: str = "Human"
+    ai_prefix: str = "AI"
+    token_budget: int = 2000
+    summary_ratio: float = 0.3
+    turns: List[Tuple[str, str]] = Field(default_factory=list)
+    summary: List[str] = Field(default_factory=list)
+    summarized: int = 0
+    facts: Dict[str, List[str]] = Field(default_factory=dict)
+    # Names seen in tool inputs, trusted when mentioned in text.
+    known_names: Set[str] = Field(default_factory=set)
+    # Gets the current names by kind, e.g. of the Walrus context.
+    current_names: Optional[Callable[[], Dict[str, str]]] = None
+
+    @property
+    def memory_variables(self) -> List[str]:
+        return [self.memory_key]
+
+    def load_memory_variables(self, inputs: Dict[str, Any]) -> Dict[str, str]:
+        return {self.memory_key: self.buffer}
+
+    def save_context(
+        self, inputs: Dict[str, Any], outputs: Dict[str, str]
+    ) -> None:
+        input_key = get_prompt_input_key(inputs, self.memory_variables)
+        output_key = "output" if "output" in outputs else list(outputs)[0]
+        human = str(inputs[input_key])
+        ai = str(outputs[output_key])
+
+        for kind, value in extract_facts(f"{human}\n{ai}", self.known_names):
+            self.pin(kind, value)
+        if self.current_names is not None:
+            for kind, value in self.current_names().items():
+                if value:
+                    self.pin(kind, value)
+        self.turns.append((human, ai))
+        self._fit()
+
+    def pin(self, kind: str, value: str):
+        """Pin a name. The latest names of each kind are kept."""
+        values = self.facts.setdefault(kind, [])
+        if value in values:
+            values.remove(value)
+        values.append(value)
+        del values[:-FACT_VALUES]
+
+    def pin_tool_input(self, tool: str, tool_input: Any):
+        """Pin the names in the input of a tool."""
+        for kind, value in input_facts(tool, tool_input):
+            self.known_names.add(value)
+            self.pin(kind, value)
+
+    def clear(self) -> None:
+        self.turns = []
+        self.summary = []
+        self.summarized = 0
+        self.facts = {}
+        self.known_names = set()
+
+    def _format_turn(self, human: str, ai: str) -> str:
+        return f"{self.human_prefix}: {human}\n{self.ai_prefix}: {ai}"
+
+    def _fit(self):
+        fixed = utils.count_tokens(self._facts_text())
+        summary_budget = int(self.token_budget * self.summary_ratio)
+        # Leave room for the section headers.
+        turns_budget = self.token_budget - fixed - summary_budget - 20
+
+        # Fold the oldest turns into the summary, keeping the latest one.
+        while len(self.turns) > 1 and self._turns_tokens() > turns_budget:
+            human, ai = self.turns.pop(0)
+            self.summary.append(summarize_turn(human, ai))
+            self.summarized += 1
+
+        while (
+            self.summary
+            and utils.count_tokens("\n".join(self.summary)) > summary_budget
+        ):
+            self.summary.pop(0)
+
+        # A single turn over the budget keeps its start and end.
+        if self.turns and self._turns_tokens() > turns_budget:
+            human, ai = self.turns[-1]
+            limit = max(turns_budget, 0) * 4
+            human = clip(human, limit // 4)
+            if len(ai) > limit - len(human):
+                half = max(limit - len(human), 0) // 2
+                ai = f"{ai[:half]}\n...\n{ai[len(ai) - half :]}"
+            self.turns[-1] = (human, ai)
+
+    def _turns_tokens(self) -> int:
+        return sum(
+            utils.count_tokens(self._format_turn(human, ai))
+            for human, ai in self.turns
+        )
+
+    def _facts_text(self) -> str:
+        if not self.facts:
+            return ""
+        lines = [
+            f"- {kind}: {', '.join(values)}"
+            for kind, values in self.facts.items()
+        ]
+        return "Names mentioned (latest last):\n" + "\n".join(lines)
+
+    @property
+    def buffer(self) -> str:
+        sections = []
+        facts = self._facts_text()
+        if facts:
+            sections.append(facts)
+        if self.summary:
+            omitted = self.summarized - len(self.summary)
+            lines = ["Earlier conversation, summarized:"]
+            if omitted > 0:
+                lines.append(f"({omitted} earlier turns omitted)")
+            sections.append("\n".join(lines + self.summary))
+        if self.turns:
+            sections.append(
+                "\n".join(
+                    self._format_turn(human, ai) for human, ai in self.turns
+                )
+            )
+        return "\n\n".join(sections)
+
+    def report(self) -> Dict[str, int]:
+        """Sizes of the memory."""
+        return {
+            "tokens": utils.count_tokens(self.buffer),
+            "budget": self.token_budget,
+            "turns": len(self.turns),
+            "summarized": self.summarized,
+            "facts": sum(len(values) for values in self.facts.values()),
+        }
+
+
+class ToolInputFactsHandler(BaseCallbackHandler):
+    """Pin the names in the inputs of agent actions to the memory."""
+
+    def __init__(self, memory: TokenBudgetMemory):
+        self.memory = memory
+
+    def on_agent_action(self, action: AgentAction, **kwargs: Any) -> Any:
+        self.memory.pin_tool_input(action.tool, action.tool_input)
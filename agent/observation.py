@@ -0,0 +1,129 @@
+"""Compact encoding of JSON observations for prompts."""
+import functools
+import json
+import logging
+import re
+import threading
+from typing import Any, Optional, Tuple
+
+from utils import records, utils
+
+logger = logging.getLogger(__name__)
+
+# Rows must have at least this share of the columns to be a table.
+MIN_COLUMN_SHARE = 0.5
+
+# Strings written as they are. Others, e.g. empty, numeric, with tabs or
+# newlines, or with surrounding spaces, are quoted.
+_bare_string = re.compile(r"[^\s\"\[{\d-]([^\t\n\r]*\S)?")
+_literals = {"true", "false", "null"}
+
+_lock = threading.Lock()
+_stats = {"calls": 0, "encoded": 0, "tokens_before": 0, "tokens_after": 0}
+
+
+def encode_value(value: Any) -> str:
+    """Encode a value for a cell. Strings are bare unless they would read
+    as another value, then they are quoted as JSON. Other values are JSON,
+    so null, booleans and numbers keep their types. Values are kept whole,
+    as they are read back, e.g. to fill update inputs."""
+    if isinstance(value, str):
+        if _bare_string.fullmatch(value) and value not in _literals:
+            return value
+        return json.dumps(value)
+    return json.dumps(value, separators=(",", ":"))
+
+
+def encode_records(items: list) -> Optional[str]:
+    """Encode a homogeneous list of objects as a header and tab-separated
+    rows, or None for other lists."""
+    if len(items) < 2 or not all(isinstance(item, dict) for item in items):
+        return None
+    rows = [records.flatten(item) for item in items]
+    columns = {}
+    for row in rows:
+        for key in row:
+            columns.setdefault(key, None)
+    if not columns:
+        return None
+    if any(len(row) < len(columns) * MIN_COLUMN_SHARE for row in rows):
+        return None
+
+    lines = [
+        f"{len(rows)} records, tab-separated with a header. Values are "
+        "JSON except for bare strings. Empty cells are missing keys:"
+    ]
+    lines.append("\t".join(columns))
+    for row in rows:
+        lines.append(
+            "\t".join(
+                encode_value(row[key]) if key in row else "" for key in columns
+            )
+        )
+    return "\n".join(lines)
+
+
+def _encode_data(data: Any) -> Optional[str]:
+    if isinstance(data, list):
+        return encode_records(data)
+    if not isinstance(data, dict):
+        return None
+    # Records in an object, e.g. a truncated list with its continuation.
+    encoded = False
+    lines = []
+    for key, value in data.items():
+        encoded_records = None
+        if isinstance(value, list):
+            encoded_records = encode_records(value)
+        if encoded_records is None:
+            lines.append(f"{key}: {json.dumps(value)}")
+        else:
+            lines.append(f"{key}: {encoded_records}")
+            encoded = True
+    return "\n".join(lines) if encoded else None
+
+
+@functools.lru_cache(maxsize=256)
+def _encode(observation: str) -> Optional[Tuple[str, int, int]]:
+    """Encode a JSON observation, with its token counts before and after.
+    None for other observations. Cached, as the same observations are
+    encoded at each step."""
+    try:
+        data = json.loads(observation)
+    except (TypeError, ValueError):
+        return None
+    encoded = _encode_data(data)
+
+    before = utils.count_tokens(observation)
+    if encoded is not None:
+        after = utils.count_tokens(encoded)
+        if after < before:
+            logger.debug(
+                f"Encoded observation from {before} to {after} tokens."
+            )
+            return encoded, before, after
+    return observation, before, before
+
+
+def encode(observation: str) -> str:
+    """Encode lists of records in a JSON observation compactly. Other
+    observations, or ones not made smaller, are returned as they are."""
+    result = _encode(observation)
+    if result is None:
+        return observation
+    encoded, before, after = result
+    with _lock:
+        _stats["calls"] += 1
+        _stats["tokens_before"] += before
+        _stats["tokens_after"] += after
+        if after < before:
+            _stats["encoded"] += 1
+    return encoded
+
+
+def stats() -> dict:
+    """Token counts of JSON observations before and after encoding."""
+    with _lock:
+        return dict(
+            _stats, saved=_stats["tokens_before"] - _stats["tokens_after"]
+        )
@@ -1,5 +1,5 @@
 import re
-from typing import Union
+from typing import List, Union
 
 from langchain.agents.agent import AgentOutputParser
 from langchain.agents.conversational.prompt import FORMAT_INSTRUCTIONS
@@ -11,26 +11,40 @@ class OutputParser(AgentOutputParser):
 
     ai_prefix: str = "AI"
     """Prefix to use before AI output."""
+    multiple_actions: bool = False
+    """Whether a step may have multiple actions. Otherwise only the first
+    action of a step is taken."""
 
     def get_format_instructions(self) -> str:
         return FORMAT_INSTRUCTIONS
 
-    def parse(self, text: str) -> Union[AgentAction, AgentFinish]:
+    def parse(
+        self, text: str
+    ) -> Union[AgentAction, List[AgentAction], AgentFinish]:
         if f"{self.ai_prefix}:" in text:
             return AgentFinish(
                 {"output": text.split(f"{self.ai_prefix}:")[-1].strip()}, text
             )
-        regex = r"Action: (.*?)[\n]*Action Input: (.*?)\nReason: .*"
-        match = re.search(regex, text, re.DOTALL)
-        if not match:
+        # Generation may stop before the Reason line. A step may have
+        # multiple actions, each with its own input.
+        regex = (
+            r"Action: (.*?)[\n]*Action Input: (.*?)"
+            r"(?=\nAction: |\nReason: |\n*$)"
+        )
+        matches = re.findall(regex, text, re.DOTALL)
+        if not matches:
             raise OutputParserException(
                 f"Could not parse LLM output: `{text}`"
             )
-        action = match.group(1)
-        action_input = match.group(2)
-        return AgentAction(
-            action.strip(), action_input.strip(" ").strip('"'), text
-        )
+        actions = [
+            AgentAction(
+                action.strip(), action_input.strip(" ").strip('"'), text
+            )
+            for action, action_input in matches
+        ]
+        if len(actions) == 1 or not self.multiple_actions:
+            return actions[0]
+        return actions
 
     @property
     def _type(self) -> str:
@@ -37,3 +37,7 @@ In the reponse, don't show project id and environment id. Unless user explicitly
 Use markdown format for the response. If the data is suitable to show in table, use markdown table.
 Please print the response to human in {natural_language}.
 """
+
+PARALLEL_ACTIONS_INSTRUCTIONS = """
+When you need multiple actions that do not depend on each other's results and do not change anything, you can take them in one step. Write an Action line and an Action Input line for each of them, then one Reason line.
+"""
@@ -0,0 +1,153 @@
+"""Render tool outputs for the user without the LLM."""
+import json
+from typing import Any, Callable, List, Optional
+
+from utils import records
+
+# Response of the agent to show the rendered output of its latest action.
+SHOW_MARKER = "[[show]]"
+SHOW_HINT = (
+    "(The user sees this as {kind} if you respond with "
+    '"{ai_prefix}: ' + SHOW_MARKER + '" only. '
+    "Do so when it answers the query as is.)"
+)
+
+MAX_ROWS = 50
+MAX_COLUMNS = 8
+MAX_CELL_CHARS = 80
+MAX_LOG_LINES = 200
+
+
+def parse_items(output: str) -> Optional[List[dict]]:
+    """Parse a JSON list of objects. Truncated lists are not items, their
+    continuation token is left to the LLM."""
+    try:
+        data = json.loads(output)
+    except (TypeError, ValueError):
+        return None
+    if not isinstance(data, list):
+        return None
+    if not all(isinstance(item, dict) for item in data):
+        return None
+    return data
+
+
+def cell(value: Any) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, list):
+        value = ", ".join(
+            json.dumps(v) if isinstance(v, (dict, list)) else str(v)
+            for v in value
+        )
+    text = " ".join(str(value).split()).replace("|", "\\|")
+    return records.clip(text, MAX_CELL_CHARS)
+
+
+def markdown_table(output: str) -> Optional[str]:
+    """Render a JSON list of objects as a markdown table. Lists too long or
+    too wide to read as a table are not rendered."""
+    items = parse_items(output)
+    if not items or len(items) > MAX_ROWS:
+        return None
+    rows = [records.flatten(item) for item in items]
+    columns = []
+    for row in rows:
+        for key, value in row.items():
+            if key not in columns and value not in (None, "", [], {}):
+                columns.append(key)
+    if not columns or len(columns) > MAX_COLUMNS:
+        return None
+
+    lines = [
+        "| " + " | ".join(columns) + " |",
+        "|" + " --- |" * len(columns),
+    ]
+    for row in rows:
+        lines.append(
+            "| "
+            + " | ".join(cell(row.get(column)) for column in columns)
+            + " |"
+        )
+    return "\n".join(lines)
+
+
+def fenced_logs(output: str) -> Optional[str]:
+    """Render fenced logs as they are. Other outputs are errors."""
+    text = output.strip()
+    if not (text.startswith("```") and text.endswith("```")):
+        return None
+    if text.count("\n") > MAX_LOG_LINES + 1:
+        return None
+    return text
+
+
+def link_list(output: str) -> Optional[str]:
+    """Render a JSON list of endpoints as a list of links."""
+    items = parse_items(output)
+    if not items or len(items) > MAX_ROWS:
+        return None
+    lines = []
+    for item in items:
+        name = item.get("name", "")
+        endpoints = item.get("endpoints") or item.get("urls")
+        if endpoints is None:
+            endpoints = [item.get("endpoint") or item.get("url")]
+        for endpoint in endpoints:
+            if not isinstance(endpoint, str) or not endpoint:
+                return None
+            if "://" in endpoint:
+                lines.append(f"- {name}: [{endpoint}]({endpoint})")
+            else:
+                lines.append(f"- {name}: `{endpoint}`")
+    return "\n".join(lines)
+
+
+class RenderPolicy:
+    """How the output of a tool is rendered for the user, and up to what
+    size. The renderer returns None for outputs of other shapes."""
+
+    def __init__(
+        self,
+        kind: str,
+        render: Callable[[str], Optional[str]],
+        max_chars: int = 20000,
+    ):
+        self.kind = kind
+        self.render = render
+        self.max_chars = max_chars
+
+
+_table = RenderPolicy("a table", markdown_table)
+_logs = RenderPolicy("logs", fenced_logs)
+_links = RenderPolicy("a list of links", link_list)
+
+RENDER_POLICIES = {
+    "list_applications": _table,
+    "list_projects": _table,
+    "list_environments": _table,
+    "list_services": _table,
+    "get_kubernetes_pod_logs": _logs,
+    "get_application_access_endpoints": _links,
+    "get_kubernetes_service_access_endpoints": _links,
+    "get_kubernetes_ingress_access_endpoints": _links,
+    "get_service_access_endpoints": _links,
+}
+
+
+def render(tool_name: str, output: str) -> Optional[str]:
+    """Render the output of a tool by its policy, or None to leave it to
+    the LLM."""
+    policy = RENDER_POLICIES.get(tool_name)
+    if policy is None or len(output) > policy.max_chars:
+        return None
+    return policy.render(output)
+
+
+def show_hint(tool_name: str, output: str, ai_prefix: str) -> Optional[str]:
+    """Get the hint to show the output as rendered, if it renders."""
+    if render(tool_name, output) is None:
+        return None
+    return SHOW_HINT.format(
+        kind=RENDER_POLICIES[tool_name].kind, ai_prefix=ai_prefix
+    )
@@ -0,0 +1,40 @@
+from typing import Iterable, List, Sequence
+
+from langchain.tools import BaseTool
+
+from utils.search import BM25Index
+
+
+class ToolRouter:
+    """Select the tools relevant to a query by lexical search over tool names
+    and descriptions. Always-on tools come first, then the selected ones in
+    their original order, so prompts of different selections share the
+    longest possible prefix."""
+
+    def __init__(
+        self,
+        tools: Sequence[BaseTool],
+        always_on: Iterable[str] = (),
+        top_k: int = 8,
+    ):
+        self.tools = list(tools)
+        self.always_on = set(always_on)
+        self.top_k = top_k
+        self.index = BM25Index(
+            self.tools,
+            [f"{tool.name} {tool.description}" for tool in self.tools],
+        )
+
+    def select(self, query: str, used: Iterable[str] = ()) -> List[BaseTool]:
+        """Get the top k tools for the query, along with always-on tools and
+        the used ones. Falls back to all tools when nothing matches."""
+        matches = self.index.search(query, self.top_k)
+        if len(matches) == 0:
+            return self.tools
+
+        names = {tool.name for tool, _ in matches} | set(used)
+        return [tool for tool in self.tools if tool.name in self.always_on] + [
+            tool
+            for tool in self.tools
+            if tool.name in names and tool.name not in self.always_on
+        ]
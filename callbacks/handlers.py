@@ -1,9 +1,13 @@
 import json
-from typing import Any, Dict, Optional, List
+import logging
+import sys
+import time
+from typing import Any, Callable, Dict, Optional, List
 from uuid import UUID
 import click
 import yaml
 
+from agent import render
 from i18n import text
 from utils import utils
 from config import config
@@ -15,6 +19,14 @@ from pygments import highlight
 from pygments.lexers import JsonLexer
 from pygments.lexers import YamlLexer
 from pygments.formatters import TerminalFormatter
+from colorama import Fore, Style
+from rich.console import Group
+from rich.live import Live
+from rich.markdown import Markdown
+from rich.text import Text
+
+
+logger = logging.getLogger(__name__)
 
 
 class HumanRejectedException(Exception):
@@ -42,6 +54,9 @@ class ApprovalCallbackHandler(BaseCallbackHandler):
 
     raise_error: bool = True
 
+    def __init__(self, preview: Optional[Callable[[str], str]] = None):
+        self.preview = preview
+
     def on_tool_start(
         self,
         serialized: Dict[str, Any],
@@ -58,6 +73,14 @@ class ApprovalCallbackHandler(BaseCallbackHandler):
 
     def _approve(self, _input: str, serialized: Dict[str, Any]) -> bool:
         message = text.get("ask_approval")
+        if self.preview is not None:
+            try:
+                preview = self.preview(_input)
+            except Exception as e:
+                logger.debug(f"Failed to preview the action: {e}")
+                preview = ""
+            if preview:
+                click.echo(preview)
         _input = remove_triple_backticks(_input.strip())
 
         is_json = False
@@ -112,3 +135,130 @@ class PrintReasoningCallbackHandler(BaseCallbackHandler):
                 utils.print_ai_reasoning(reason_text)
                 break
         """Print AI reasoning."""
+
+
+class StreamingOutputCallbackHandler(BaseCallbackHandler):
+    """Render AI reasoning and response as tokens arrive."""
+
+    reason_prefix = "Reason:"
+    ai_prefix = "AI:"
+    # Max number of markdown renders per second.
+    frame_rate = 10
+
+    def __init__(self):
+        self.answered = False
+        self._reset()
+
+    def _reset(self):
+        self._buffer = ""
+        self._position = 0
+        self._state = "scan"
+        self._skip_space = False
+        self._live = None
+        self._rendered_at = 0.0
+
+    def on_llm_start(
+        self,
+        serialized: Dict[str, Any],
+        prompts: List[str],
+        **kwargs: Any,
+    ) -> None:
+        self._reset()
+
+    def on_chat_model_start(
+        self,
+        serialized: Dict[str, Any],
+        messages: List[List[Any]],
+        **kwargs: Any,
+    ) -> None:
+        self._reset()
+
+    def on_llm_new_token(self, token: str, **kwargs: Any) -> None:
+        self._buffer += token
+        self._process()
+
+    def on_llm_end(self, response: LLMResult, **kwargs: Any) -> None:
+        if self._state == "reason":
+            print(Style.RESET_ALL)
+        elif self._state == "answer":
+            self._render(final=True)
+            if self._live is not None:
+                self._live.stop()
+        self._reset()
+
+    def on_llm_error(self, error: BaseException, **kwargs: Any) -> None:
+        if self._live is not None:
+            self._live.stop()
+        self._reset()
+
+    def _process(self):
+        while True:
+            if self._state == "answer":
+                self._render()
+                return
+
+            rest = self._buffer[self._position :]
+            if self._state == "reason":
+                if self._skip_space:
+                    stripped = rest.lstrip(" ")
+                    self._position += len(rest) - len(stripped)
+                    rest = stripped
+                    if not rest:
+                        return
+                    self._skip_space = False
+                newline = rest.find("\n")
+                sys.stdout.write(rest if newline < 0 else rest[:newline])
+                sys.stdout.flush()
+                if newline < 0:
+                    self._position = len(self._buffer)
+                    return
+                print(Style.RESET_ALL)
+                self._position += newline + 1
+                self._state = "scan"
+                continue
+
+            # At the start of a line.
+            line = rest.lstrip(" ")
+            if line.startswith(self.ai_prefix):
+                self._position += len(rest) - len(line) + len(self.ai_prefix)
+                self._state = "answer"
+                continue
+            if (
+                line.startswith(self.reason_prefix)
+                and config.APPILOT_CONFIG.show_reasoning
+            ):
+                self._position += (
+                    len(rest) - len(line) + len(self.reason_prefix)
+                )
+                self._state = "reason"
+                self._skip_space = True
+                sys.stdout.write(Fore.CYAN + text.get("ai_reasoning"))
+                continue
+            newline = rest.find("\n")
+            if newline < 0:
+                return
+            self._position += newline + 1
+
+    def _render(self, final: bool = False):
+        now = time.time()
+        if not final and now - self._rendered_at < 1 / self.frame_rate:
+            return
+        self._rendered_at = now
+        answer = self._buffer[self._position :].strip()
+        if self._live is None:
+            # Wait until the answer is more than a show marker.
+            if render.SHOW_MARKER.startswith(answer):
+                return
+            self.answered = True
+            self._live = Live(console=utils.console, auto_refresh=False)
+            self._live.start()
+        if final and render.SHOW_MARKER in answer:
+            # The marker is replaced by rendered output after the run. Clear
+            # the answer to show it whole then.
+            self._live.transient = True
+            self.answered = False
+            return
+        self._live.update(
+            Group(Text(text.get("response_prefix")), Markdown(answer)),
+            refresh=True,
+        )
@@ -3,55 +3,97 @@ from typing import Any
 import readline
 
 
+import langchain
 from langchain.chat_models import ChatOpenAI
-from langchain.memory import ConversationBufferMemory
 import colorama
 
 from callbacks import handlers
 from config import config
 from i18n import text
 from utils import utils
+from utils.llm_cache import SQLiteLLMCache
+from agent import observation
 from agent.agent import create_agent
+from agent.fast_path import FastPath
+from agent.llm import ActionStreamingChatOpenAI
+from agent.memory import TokenBudgetMemory, ToolInputFactsHandler
+from walrus import context as walrus_context
 from walrus.toolkit import WalrusToolKit
 from k8s.toolkit import KubernetesToolKit
 
 last_error = None
+memory = None
+fast_path = None
+streaming_handler = handlers.StreamingOutputCallbackHandler()
 
 
 def setup_agent() -> Any:
     config.init()
     colorama.init()
 
+    if config.APPILOT_CONFIG.llm_cache:
+        langchain.llm_cache = SQLiteLLMCache(
+            utils.state_path("llm_cache.sqlite")
+        )
+
     llm = ChatOpenAI(
         model_name="gpt-4",
         temperature=0,
         callbacks=[handlers.PrintReasoningCallbackHandler()],
     )
+    # Agent prompts carry the whole conversation and rarely repeat. Keep
+    # them out of the completion cache.
+    # Stream to stop generating once an action is complete. The tokens are
+    # rendered in streaming mode only.
+    if config.APPILOT_CONFIG.streaming:
+        agent_callbacks = [streaming_handler]
+    else:
+        agent_callbacks = [handlers.PrintReasoningCallbackHandler()]
+    agent_llm = ActionStreamingChatOpenAI(
+        model_name="gpt-4",
+        temperature=0,
+        cache=False,
+        streaming=True,
+        callbacks=agent_callbacks,
+    )
 
     text.init_system_messages(llm)
 
-    memory = ConversationBufferMemory(memory_key="chat_history")
+    global memory
+    memory = TokenBudgetMemory(
+        memory_key="chat_history",
+        token_budget=config.APPILOT_CONFIG.memory_token_budget,
+    )
 
     enabled_toolkits = [
         toolkit.lower() for toolkit in config.APPILOT_CONFIG.toolkits
     ]
 
     tools = []
+    intents = []
     if "kubernetes" in enabled_toolkits:
         kubernetes_toolkit = KubernetesToolKit(llm=llm)
         tools.extend(kubernetes_toolkit.get_tools())
+        intents.extend(kubernetes_toolkit.get_intents())
     elif "walrus" in enabled_toolkits:
         walrus_toolkit = WalrusToolKit(llm=llm)
         tools.extend(walrus_toolkit.get_tools())
+        intents.extend(walrus_toolkit.get_intents())
+        memory.current_names = walrus_context.current_names
     else:
         print(text.get("enable_no_toolkit"))
         sys.exit(1)
 
+    global fast_path
+    if config.APPILOT_CONFIG.fast_path:
+        fast_path = FastPath(intents, tools)
+
     return create_agent(
-        llm,
+        agent_llm,
         shared_memory=memory,
         tools=tools,
         verbose=config.APPILOT_CONFIG.verbose,
+        agent_executor_kwargs={"callbacks": [ToolInputFactsHandler(memory)]},
     )
 
 
@@ -69,13 +111,21 @@ def run():
         elif user_query == "appilot_log":
             print_last_error()
             continue
+        elif user_query == "appilot_cache":
+            print_llm_cache_stats()
+            continue
+        elif user_query == "appilot_memory":
+            print(text.get("memory_stats").format(**memory.report()))
+            print(text.get("observation_stats").format(**observation.stats()))
+            continue
         elif user_query.startswith("#"):
             continue
         elif not user_query.strip():
             continue
 
+        streaming_handler.answered = False
         try:
-            result = appilot_agent.run(user_query)
+            result = run_query(appilot_agent, user_query)
         except handlers.HumanRejectedException as he:
             utils.print_rejected_message()
             continue
@@ -83,7 +133,23 @@ def run():
             handle_exception(e)
             continue
 
-        utils.print_ai_response(result)
+        # A streamed response is already shown.
+        if not streaming_handler.answered:
+            utils.print_ai_response(result)
+
+
+def run_query(appilot_agent, user_query: str) -> str:
+    """Answer formulaic queries by the fast path, others by the agent."""
+    matched = fast_path.match(user_query) if fast_path else None
+    if matched is None:
+        return appilot_agent.run(user_query)
+
+    tool, tool_input = matched
+    memory.pin_tool_input(tool.name, tool_input)
+    result = fast_path.run(tool, tool_input)
+    # Keep the turn for follow-up queries to the agent.
+    memory.save_context({"input": user_query}, {"output": result})
+    return result
 
 
 def handle_exception(e):
@@ -99,3 +165,12 @@ def print_last_error():
         print(text.get("no_error_message"))
     else:
         print(last_error)
+
+
+def print_llm_cache_stats():
+    if isinstance(langchain.llm_cache, SQLiteLLMCache):
+        print(
+            text.get("llm_cache_stats").format(**langchain.llm_cache.stats())
+        )
+    else:
+        print(text.get("llm_cache_disabled"))
@@ -14,6 +14,14 @@ class Config(BaseModel):
     toolkits: list[str]
     show_reasoning: bool
     verbose: bool
+    llm_cache: bool
+    streaming: bool
+    parallel_actions: bool
+    memory_token_budget: int
+    tool_routing: bool
+    tool_routing_top_k: int
+    fast_path: bool
+    render_output: bool
 
 
 APPILOT_CONFIG: Config
@@ -27,6 +35,14 @@ def init():
     toolkits = utils.get_env_list("TOOLKITS")
     show_reasoning = utils.get_env_bool("SHOW_REASONING", True)
     verbose = utils.get_env_bool("VERBOSE", False)
+    llm_cache = utils.get_env_bool("LLM_CACHE", True)
+    streaming = utils.get_env_bool("STREAMING", False)
+    parallel_actions = utils.get_env_bool("PARALLEL_ACTIONS", False)
+    memory_token_budget = int(utils.get_env("MEMORY_TOKEN_BUDGET", "2000"))
+    tool_routing = utils.get_env_bool("TOOL_ROUTING", False)
+    tool_routing_top_k = int(utils.get_env("TOOL_ROUTING_TOP_K", "8"))
+    fast_path = utils.get_env_bool("FAST_PATH", True)
+    render_output = utils.get_env_bool("RENDER_OUTPUT", True)
 
     if not openai_api_key:
         raise Exception("OPENAI_API_KEY is not set")
@@ -44,6 +60,14 @@ def init():
         toolkits=toolkits,
         show_reasoning=show_reasoning,
         verbose=verbose,
+        llm_cache=llm_cache,
+        streaming=streaming,
+        parallel_actions=parallel_actions,
+        memory_token_budget=memory_token_budget,
+        tool_routing=tool_routing,
+        tool_routing_top_k=tool_routing_top_k,
+        fast_path=fast_path,
+        render_output=render_output,
     )
 
 
@@ -1 +1 @@
-"""For internationalization. Most of the job is done by prompts. For the rest system messages, we also use AI to translate them."""
+"""For internationalization. Most of the job is done by prompts. For the rest system messages, we also use AI to translate them. Translations are bundled in translations/ for common languages and cached locally for the others."""
@@ -1,9 +1,22 @@
+import hashlib
 import json
+import logging
+import os
+import string
+import threading
 
 from config import config
+from utils import utils
 
 from langchain.schema.language_model import BaseLanguageModel
 
+logger = logging.getLogger(__name__)
+
+# Translations shipped with the package.
+BUNDLED_TRANSLATIONS_DIR = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "translations"
+)
+
 prompt = """
 Translate the following json map to {language}. Keep the keys unchanged.
 {messages}
@@ -12,7 +25,7 @@ RESULT:
 
 """
 
-system_messages = {
+source_messages = {
     "welcome": "Appilot: What can I help?",
     "ai_reasoning": "Appilot reasoning: ",
     "response_prefix": "Appilot: ",
@@ -20,12 +33,19 @@ system_messages = {
     "error_occur_message": "An internal error occurred. Enter 'appilot_log' if you want to see the details.",
     "rejected_message": "The action is rejected.",
     "no_error_message": "No error occurred.",
+    "llm_cache_stats": "LLM cache: {hits} hits, {misses} misses, {entries} entries.",
+    "llm_cache_disabled": "LLM cache is disabled.",
+    "memory_stats": "Memory: {tokens}/{budget} tokens, {turns} recent turns, {summarized} summarized turns, {facts} pinned names.",
+    "observation_stats": "Observations: {encoded}/{calls} JSON observations encoded as tables, {tokens_before} tokens reduced to {tokens_after}.",
     "resource_log_prefix": "Here's the log:",
     "watch_service_note": "( Enter <Ctrl + C> to halt )",
     "watch_service_ending": "Halted.",
     "show_graph_message": "The dependency graph is shown to you.",
+    "clone_environment_preview": "Services to clone:",
     "inform_ready_start": "Start watching. Will inform when it's ready.",
     "service_ready_message": "Service {} is Ready.",
+    "service_not_ready_message": "Service {} is not ready after {} minutes.",
+    "service_watch_failed_message": "Stopped watching service {}: {}",
     "enable_no_toolkit": "No toolkit available. Please enable at least one toolkit.",
     "ask_approval": """
 The following action requires approval:
@@ -40,18 +60,118 @@ Do you approve the above action? """,
 }
 
 
+system_messages = dict(source_messages)
+
+
+def message_hash(message: str) -> str:
+    return hashlib.sha256(message.encode("utf-8")).hexdigest()[:16]
+
+
+def format_fields(message: str) -> set:
+    return {
+        field
+        for _, field, _, _ in string.Formatter().parse(message)
+        if field is not None
+    }
+
+
+def translation_path(language: str) -> str:
+    name = "_".join(language.lower().split())
+    return utils.state_path("translations", f"{name}.json")
+
+
+def load_translations(path: str) -> dict:
+    """Load translations of the current source messages. Translations of
+    changed source messages are skipped."""
+    try:
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+    hashes = data.get("source_hashes", {})
+    return {
+        key: message
+        for key, message in data.get("messages", {}).items()
+        if key in source_messages
+        and hashes.get(key) == message_hash(source_messages[key])
+    }
+
+
+def save_translations(path: str, translations: dict):
+    data = {
+        "source_hashes": {
+            key: message_hash(source_messages[key]) for key in translations
+        },
+        "messages": translations,
+    }
+    temporary_path = f"{path}.{os.getpid()}.tmp"
+    with open(temporary_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+    os.replace(temporary_path, path)
+
+
+def translate(llm: BaseLanguageModel, language: str, messages: dict) -> dict:
+    """Translate messages with the LLM. Translations that break the format
+    fields of a message are dropped."""
+    result = llm.predict(
+        prompt.format(
+            language=language,
+            messages=json.dumps(messages, ensure_ascii=False),
+        )
+    )
+    translated = json.loads(result)
+    return {
+        key: message
+        for key, message in translated.items()
+        if key in messages
+        and isinstance(message, str)
+        and format_fields(message) == format_fields(messages[key])
+    }
+
+
+def translate_missing(
+    llm: BaseLanguageModel, language: str, translations: dict, path: str
+):
+    global system_messages
+    missing = {
+        key: message
+        for key, message in source_messages.items()
+        if key not in translations
+    }
+    try:
+        translations = {**translations, **translate(llm, language, missing)}
+        save_translations(path, translations)
+    except Exception as e:
+        logger.debug(f"Failed to translate system messages: {e}")
+        return
+    system_messages = {**source_messages, **translations}
+
+
 def init_system_messages(llm: BaseLanguageModel):
+    """Use translated system messages from the bundle and the local cache.
+    Missing ones are translated in the background, with English messages
+    in the meantime."""
     language = config.APPILOT_CONFIG.natural_language
     if language.lower() in ("en", "english"):
         return
 
     global system_messages
-    system_messages_string = json.dumps(system_messages, ensure_ascii=False)
-    result = llm.predict(
-        prompt.format(language=language, messages=system_messages_string)
+    path = translation_path(language)
+    bundled_path = os.path.join(
+        BUNDLED_TRANSLATIONS_DIR, os.path.basename(path)
     )
-    translated = json.loads(result)
-    system_messages = translated
+    translations = {
+        **load_translations(bundled_path),
+        **load_translations(path),
+    }
+    system_messages = {**source_messages, **translations}
+    if len(translations) < len(source_messages):
+        threading.Thread(
+            target=translate_missing,
+            args=(llm, language, translations, path),
+            daemon=True,
+        ).start()
 
 
 def get(key):
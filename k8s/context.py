@@ -84,3 +84,15 @@ def search_api_resource(resource_kind: str) -> GroupVersionKind:
         )
 
     raise Exception(f"Resource {resource_kind} not found.")
+
+
+NAMESPACES: list[str] | None = None
+
+
+def get_namespaces(refresh: bool = False) -> list[str]:
+    """Get names of namespaces in the cluster. Cached after the first call."""
+    global NAMESPACES
+    if NAMESPACES is None or refresh:
+        namespaces = client.CoreV1Api().list_namespace()
+        NAMESPACES = [item.metadata.name for item in namespaces.items]
+    return NAMESPACES
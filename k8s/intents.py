@@ -0,0 +1,100 @@
+"""Formulaic Kubernetes queries answered without the agent."""
+import logging
+import re
+from typing import Optional
+
+from kubernetes import client
+
+from agent.fast_path import Intent
+from k8s import context
+
+logger = logging.getLogger(__name__)
+
+_name = r"[a-z0-9][a-z0-9.-]*"
+_verb = r"(?:list|show|get)(?: me)?(?: all)?(?: the)?"
+
+_all_namespaces = re.compile(
+    r"(?:in|from|across) all namespaces|-a|--all-namespaces"
+)
+_namespace = re.compile(
+    rf"(?:in|from) (?:the )?(?:namespace )?({_name})(?: namespace)?"
+    rf"|-n ({_name})"
+)
+
+
+def parse_namespace(scope: Optional[str]) -> Optional[str]:
+    """Get the namespace input from the scope of a query, "--all" for all
+    namespaces or "" for the current one. None if the scope is not a known
+    namespace."""
+    if not scope:
+        return ""
+    scope = scope.strip()
+    if _all_namespaces.fullmatch(scope):
+        return "--all"
+    match = _namespace.fullmatch(scope)
+    if match is None:
+        return None
+    namespace = match.group(1) or match.group(2)
+    try:
+        namespaces = context.get_namespaces()
+    except Exception as e:
+        logger.debug(f"Failed to list namespaces: {e}")
+        return None
+    if namespace not in namespaces:
+        return None
+    return namespace
+
+
+def list_resources_input(match: re.Match) -> Optional[dict]:
+    namespace = parse_namespace(match.group("scope"))
+    if namespace is None:
+        return None
+    resource_kind = match.group("kind")
+    try:
+        context.search_api_resource(resource_kind)
+    except Exception:
+        return None
+    return {"resource_kind": resource_kind, "namespace": namespace}
+
+
+def pod_logs_input(match: re.Match) -> Optional[dict]:
+    namespace = parse_namespace(match.group("scope"))
+    if namespace is None or namespace == "--all":
+        return None
+    namespace = namespace or "default"
+    name = match.group("name")
+    # Names of other resources are left to the agent to find the pod.
+    try:
+        client.CoreV1Api().read_namespaced_pod(name, namespace)
+    except Exception:
+        return None
+    return {"name": name, "namespace": namespace}
+
+
+def list_applications_input(match: re.Match) -> Optional[dict]:
+    namespace = parse_namespace(match.group("scope"))
+    if namespace is None:
+        return None
+    return {"namespace": namespace}
+
+
+def get_intents() -> list[Intent]:
+    return [
+        Intent(
+            rf"{_verb} (?:helm )?(?:applications|apps|releases)"
+            r"(?P<scope> .+)?",
+            "list_applications",
+            list_applications_input,
+        ),
+        Intent(
+            rf"(?:(?:show|get|print)(?: me)? )?(?:the )?logs? (?:of|for|from) "
+            rf"(?:the )?(?:pod )?(?P<name>{_name})(?P<scope> .+)?",
+            "get_kubernetes_pod_logs",
+            pod_logs_input,
+        ),
+        Intent(
+            rf"{_verb} (?P<kind>[a-z0-9.-]+)(?P<scope> .+)?",
+            "list_kubernetes_resources",
+            list_resources_input,
+        ),
+    ]
@@ -4,7 +4,7 @@ import sys
 from langchain.schema.language_model import BaseLanguageModel
 from kubernetes import config, client
 
-from k8s import context
+from k8s import context, intents
 from k8s.tools.helm.tool import (
     DeleteApplicationTool,
     DeployApplicationTool,
@@ -106,3 +106,6 @@ class KubernetesToolKit:
             DeleteApplicationTool(),
         ]
         return tools
+
+    def get_intents(self):
+        return intents.get_intents()
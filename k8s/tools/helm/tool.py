@@ -31,8 +31,16 @@ def trim_default_values(input_string):
     return first_300_lines
 
 
+# Trimmed default values by chart URL. A chart URL refers to a fixed chart
+# version, so its default values never change.
+chart_default_values_cache: dict[str, str] = {}
+
+
 def get_chart_default_values(chart_url: str):
     """Get default values(in yaml) of a helm chart."""
+    if chart_url in chart_default_values_cache:
+        return chart_default_values_cache[chart_url]
+
     helm_show_values_command = f"helm show values {chart_url}"
 
     try:
@@ -40,7 +48,9 @@ def get_chart_default_values(chart_url: str):
             helm_show_values_command, shell=True, universal_newlines=True
         )
 
-        return trim_default_values(output)
+        default_values = trim_default_values(output)
+        chart_default_values_cache[chart_url] = default_values
+        return default_values
     except subprocess.CalledProcessError as e:
         return f"Helm show values failed: {e}"
     except Exception as e:
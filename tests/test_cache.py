@@ -0,0 +1,57 @@
+import os
+import time
+
+from walrus.cache import CacheEntry, ResponseCache
+
+
+def entry(body: str) -> CacheEntry:
+    return CacheEntry(body=body, expires_at=time.time() + 60)
+
+
+def test_invalidate_by_prefix(tmp_path):
+    cache = ResponseCache(cache_dir=str(tmp_path))
+    cache.put("http://x#a/v1/projects/1/environments", entry("envs"))
+    cache.put("http://x#a/v1/projects/1/environments?page=2", entry("more"))
+    cache.put("http://x#a/v1/projects", entry("projects"))
+
+    cache.invalidate("http://x#a/v1/projects/1/environments")
+
+    assert cache.get("http://x#a/v1/projects/1/environments") is None
+    assert cache.get("http://x#a/v1/projects/1/environments?page=2") is None
+    assert cache.get("http://x#a/v1/projects").body == "projects"
+    # Invalidated entries are not loaded from the directory either.
+    reloaded = ResponseCache(cache_dir=str(tmp_path))
+    assert reloaded.get("http://x#a/v1/projects/1/environments") is None
+    assert reloaded.get("http://x#a/v1/projects").body == "projects"
+
+
+def test_evicted_entries_are_removed_from_the_directory(tmp_path):
+    cache = ResponseCache(max_entries=2, cache_dir=str(tmp_path))
+    cache.put("a", entry("a"))
+    cache.put("b", entry("b"))
+    cache.get("a")
+    cache.put("c", entry("c"))
+
+    assert len(os.listdir(tmp_path)) == 2
+    assert cache.get("b") is None
+    assert cache.get("a").body == "a"
+
+
+def test_directory_is_pruned_to_recent_entries(tmp_path):
+    cache = ResponseCache(max_entries=3, cache_dir=str(tmp_path))
+    for i in range(3):
+        cache.put(str(i), entry(str(i)))
+    (tmp_path / "notes.txt").write_text("kept")
+
+    cache = ResponseCache(max_entries=1, cache_dir=str(tmp_path))
+
+    assert sorted(os.listdir(tmp_path))[-1] == "notes.txt"
+    assert len(os.listdir(tmp_path)) == 2
+
+
+def test_memory_only_cache():
+    cache = ResponseCache(max_entries=1)
+    cache.put("a", entry("a"))
+    cache.put("b", entry("b"))
+    assert cache.get("a") is None
+    assert cache.get("b").body == "b"
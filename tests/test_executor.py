@@ -0,0 +1,101 @@
+from typing import Any, List, Tuple, Union
+
+from langchain.agents.agent import BaseSingleActionAgent
+from langchain.schema import AgentAction, AgentFinish, OutputParserException
+from langchain.tools import Tool
+
+from agent.executor import ParallelAgentExecutor
+
+
+class PlannedAgent(BaseSingleActionAgent):
+    """Agent planning the given actions once, then finishing. Like the
+    conversational agent, it plans several actions in one step."""
+
+    actions: List[AgentAction]
+
+    @property
+    def input_keys(self) -> List[str]:
+        return ["input"]
+
+    def plan(
+        self,
+        intermediate_steps: List[Tuple[AgentAction, str]],
+        callbacks: Any = None,
+        **kwargs: Any,
+    ) -> Union[List[AgentAction], AgentFinish]:
+        if intermediate_steps:
+            return AgentFinish({"output": "done"}, "done")
+        if not self.actions:
+            raise OutputParserException("Could not parse", send_to_llm=False)
+        return self.actions
+
+    async def aplan(self, *args: Any, **kwargs: Any):
+        raise NotImplementedError
+
+
+def take_step(actions: List[AgentAction], ran: List[str]):
+    def tool(name: str, return_direct: bool = False):
+        def run(tool_input: str) -> str:
+            ran.append(name)
+            return f"{name} output"
+
+        return Tool(
+            name=name, func=run, description=name, return_direct=return_direct
+        )
+
+    tools = [tool("list_pods"), tool("list_services"), tool("logs", True)]
+    executor = ParallelAgentExecutor(
+        agent=PlannedAgent(actions=actions),
+        tools=tools,
+        handle_parsing_errors=True,
+    )
+    return executor._take_next_step(
+        {tool.name: tool for tool in tools},
+        {tool.name: "green" for tool in tools},
+        {"input": "q"},
+        [],
+    )
+
+
+def test_runs_actions_of_a_step():
+    ran = []
+    steps = take_step(
+        [
+            AgentAction("list_pods", "", ""),
+            AgentAction("list_services", "", ""),
+        ],
+        ran,
+    )
+    assert sorted(ran) == ["list_pods", "list_services"]
+    assert [observation for _, observation in steps] == [
+        "list_pods output",
+        "list_services output",
+    ]
+
+
+def test_return_direct_action_runs_alone():
+    ran = []
+    steps = take_step(
+        [AgentAction("logs", "", ""), AgentAction("list_pods", "", "")], ran
+    )
+    assert ran == ["logs"]
+    assert [(action.tool, observation) for action, observation in steps] == [
+        ("logs", "logs output")
+    ]
+
+
+def test_return_direct_action_waits_for_actions_before_it():
+    ran = []
+    steps = take_step(
+        [AgentAction("list_pods", "", ""), AgentAction("logs", "", "")], ran
+    )
+    assert ran == ["list_pods"]
+    assert [action.tool for action, _ in steps] == ["list_pods"]
+
+
+def test_parsing_error_becomes_an_observation():
+    steps = take_step([], [])
+    assert len(steps) == 1
+    action, observation = steps[0]
+    assert action.tool == "_Exception"
+    assert observation == "Invalid or incomplete response"
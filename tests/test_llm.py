@@ -0,0 +1,93 @@
+from types import SimpleNamespace
+
+import pytest
+from langchain.chat_models import ChatOpenAI
+from langchain.schema.messages import AIMessageChunk
+from langchain.schema.output import ChatGenerationChunk
+
+from agent.llm import (
+    ActionStreamingChatOpenAI,
+    action_input_end,
+    is_action_complete,
+)
+from config import config
+
+
+@pytest.mark.parametrize(
+    "text, complete",
+    [
+        ("Thought: list pods", False),
+        ("Action: list_pods\nAction Input: ", False),
+        ("Action: list_pods\nAction Input: default", False),
+        ("Action: list_pods\nAction Input: default\n", True),
+        ('Action: get_pod\nAction Input: {"name": "a"', False),
+        ('Action: get_pod\nAction Input: {"name": "a"}', True),
+        ("Action: apply\nAction Input: ```yaml\nkind: Pod\n", False),
+        ("Action: apply\nAction Input: ```yaml\nkind: Pod\n```", True),
+        ("AI: done\nAction: list_pods\nAction Input: default\n", False),
+    ],
+)
+def test_is_action_complete(text, complete):
+    assert is_action_complete(text) == complete
+
+
+def test_is_action_complete_waits_for_reason():
+    text = 'Action: get_pod\nAction Input: {"name": "a"}'
+    assert not is_action_complete(text, wait_reason=True)
+    assert not is_action_complete(text + "\nReason: to", wait_reason=True)
+    assert is_action_complete(text + "\nReason: to see\n", wait_reason=True)
+
+
+def test_action_input_end():
+    text = 'Action: get_pod\nAction Input: {"name": "a"}\nRea'
+    assert text[: action_input_end(text)].endswith('{"name": "a"}')
+
+
+def stream(monkeypatch, chunks, show_reasoning=False):
+    monkeypatch.setattr(
+        config,
+        "APPILOT_CONFIG",
+        SimpleNamespace(show_reasoning=show_reasoning, parallel_actions=False),
+        raising=False,
+    )
+
+    def parent_stream(self, messages, stop=None, run_manager=None, **kwargs):
+        for content in chunks:
+            yield ChatGenerationChunk(message=AIMessageChunk(content=content))
+
+    monkeypatch.setattr(ChatOpenAI, "_stream", parent_stream)
+    llm = ActionStreamingChatOpenAI(openai_api_key="test")
+    return "".join(chunk.message.content for chunk in llm._stream([]))
+
+
+def test_stream_cuts_chunk_in_the_middle_of_a_line(monkeypatch):
+    text = stream(
+        monkeypatch,
+        [
+            "Action: get_pod\nAction Input: ",
+            '{"name": ',
+            '"a"}\nRea',
+            "son: to see\n",
+        ],
+    )
+    assert text == 'Action: get_pod\nAction Input: {"name": "a"}'
+
+
+def test_stream_cuts_chunk_after_the_reason_line(monkeypatch):
+    text = stream(
+        monkeypatch,
+        [
+            "Action: list_pods\nAction Input: default\nReason: to",
+            " see\nAct",
+            "ion: get_pod\n",
+        ],
+        show_reasoning=True,
+    )
+    assert text == (
+        "Action: list_pods\nAction Input: default\nReason: to see\n"
+    )
+
+
+def test_stream_keeps_answers(monkeypatch):
+    text = stream(monkeypatch, ["AI: there are ", "no pods.\n"])
+    assert text == "AI: there are no pods.\n"
@@ -0,0 +1,46 @@
+from langchain.schema import Generation
+
+from utils.llm_cache import SQLiteLLMCache
+
+
+def test_lookup_and_update(tmp_path):
+    cache = SQLiteLLMCache(str(tmp_path / "cache.sqlite"))
+    assert cache.lookup("prompt", "llm") is None
+    cache.update("prompt", "llm", [Generation(text="completion")])
+
+    assert cache.lookup("prompt", "llm") == [Generation(text="completion")]
+    # The prompt and the LLM parameters are both in the key.
+    assert cache.lookup("prompt with new state", "llm") is None
+    assert cache.lookup("prompt", "llm with other parameters") is None
+    assert cache.stats() == {"hits": 1, "misses": 3, "entries": 1}
+
+
+def test_persisted(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    SQLiteLLMCache(path).update("prompt", "llm", [Generation(text="a")])
+    assert SQLiteLLMCache(path).lookup("prompt", "llm")[0].text == "a"
+
+
+def test_least_recently_used_evicted(tmp_path):
+    cache = SQLiteLLMCache(str(tmp_path / "cache.sqlite"), max_entries=2)
+    cache.update("a", "llm", [Generation(text="a")])
+    cache.update("b", "llm", [Generation(text="b")])
+    cache.lookup("a", "llm")
+    cache.update("c", "llm", [Generation(text="c")])
+
+    assert cache.lookup("b", "llm") is None
+    assert cache.lookup("a", "llm") is not None
+    assert cache.lookup("c", "llm") is not None
+
+
+def test_expired_not_used(tmp_path):
+    cache = SQLiteLLMCache(str(tmp_path / "cache.sqlite"), max_age=-1)
+    cache.update("prompt", "llm", [Generation(text="a")])
+    assert cache.lookup("prompt", "llm") is None
+
+
+def test_clear(tmp_path):
+    cache = SQLiteLLMCache(str(tmp_path / "cache.sqlite"))
+    cache.update("prompt", "llm", [Generation(text="a")])
+    cache.clear()
+    assert cache.stats()["entries"] == 0
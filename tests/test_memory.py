@@ -0,0 +1,58 @@
+from agent.memory import TokenBudgetMemory, extract_facts, input_facts
+
+
+def test_extract_facts():
+    facts = extract_facts("Show pods in namespace kube-system please.")
+    assert ("namespace", "kube-system") in facts
+    assert ("service", "web-1") in extract_facts("the web-1 service is down")
+
+
+def test_extract_facts_skips_words():
+    assert extract_facts("Create the new environment for this service.") == []
+    assert extract_facts("Which environment is it in?") == []
+
+
+def test_extract_facts_takes_known_names():
+    text = "Clone the staging environment."
+    assert extract_facts(text) == []
+    assert extract_facts(text, {"staging"}) == [("environment", "staging")]
+
+
+def test_input_facts():
+    assert input_facts(
+        "clone_environment",
+        '{"original_environment_name": "dev", "target_environment_name": '
+        '"qa"}',
+    ) == [("environment", "dev"), ("environment", "qa")]
+    assert input_facts(
+        "get_kubernetes_pod_logs", {"name": "web-0", "namespace": "default"}
+    ) == [("namespace", "default"), ("pod", "web-0")]
+    assert input_facts("list_resources", {"namespace": "--all"}) == []
+    assert input_facts("list_services", "") == []
+
+
+def test_memory_pins_tool_inputs_and_current_names():
+    memory = TokenBudgetMemory(
+        current_names=lambda: {"project": "default", "environment": ""}
+    )
+    memory.pin_tool_input("clone_environment", {"environment": "staging"})
+    memory.save_context(
+        {"input": "Is staging ready?"}, {"output": "Yes, it is."}
+    )
+    assert memory.facts == {
+        "environment": ["staging"],
+        "project": ["default"],
+    }
+    assert "- environment: staging" in memory.buffer
+
+
+def test_memory_stays_within_budget():
+    memory = TokenBudgetMemory(token_budget=200)
+    for i in range(20):
+        memory.save_context(
+            {"input": f"question {i} " * 10}, {"output": f"answer {i} " * 10}
+        )
+    report = memory.report()
+    assert report["tokens"] <= 200
+    assert report["summarized"] > 0
+    assert memory.turns[-1][0].startswith("question 19")
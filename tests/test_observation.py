@@ -0,0 +1,66 @@
+import json
+
+from agent import observation
+
+
+def test_encode_records():
+    items = [
+        {"name": "web", "replicas": 2, "labels": {"app": "web"}},
+        {"name": "db", "replicas": None, "labels": {}},
+    ]
+    lines = observation.encode_records(items).split("\n")
+    assert lines[0].startswith("2 records")
+    assert lines[1] == "name\treplicas\tlabels.app\tlabels"
+    assert lines[2] == "web\t2\tweb\t"
+    assert lines[3] == "db\tnull\t\t{}"
+
+
+def test_encode_records_keeps_types_of_strings():
+    items = [
+        {"name": "a", "value": "false"},
+        {"name": "b", "value": "123"},
+        {"name": "c", "value": ""},
+        {"name": "d", "value": "two\nlines"},
+    ]
+    rows = observation.encode_records(items).split("\n")[2:]
+    assert [row.split("\t")[1] for row in rows] == [
+        '"false"',
+        '"123"',
+        '""',
+        '"two\\nlines"',
+    ]
+
+
+def test_encode_records_keeps_long_values():
+    value = "x" * 1000
+    items = [{"name": "a", "value": value}, {"name": "b", "value": value}]
+    assert value in observation.encode_records(items).split("\n")[2]
+
+
+def test_encode_records_skips_other_lists():
+    assert observation.encode_records([{"name": "a"}]) is None
+    assert observation.encode_records(["a", "b"]) is None
+    assert (
+        observation.encode_records([{"a": 1, "b": 2, "c": 3}, {"d": 4}])
+        is None
+    )
+
+
+def test_encode_counts_every_call():
+    items = [
+        {"name": f"service-{i}", "status": "Ready", "replicas": i}
+        for i in range(10)
+    ]
+    text = json.dumps(items)
+    before = observation.stats()
+    first = observation.encode(text)
+    second = observation.encode(text)
+    after = observation.stats()
+    assert first == second != text
+    assert after["calls"] - before["calls"] == 2
+    assert after["encoded"] - before["encoded"] == 2
+
+
+def test_encode_keeps_other_observations():
+    assert observation.encode("No services found.") == "No services found."
+    assert observation.encode('{"name": "a"}') == '{"name": "a"}'
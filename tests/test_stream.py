@@ -0,0 +1,74 @@
+import json
+
+import pytest
+
+from walrus.stream import (
+    EventDecoder,
+    EventTooLargeError,
+    ServiceStateTable,
+    first_array_item,
+)
+
+
+def test_event_decoder_across_chunks():
+    stream = (
+        json.dumps({"type": "create", "items": [{"id": "1"}]})
+        + "\n"
+        + json.dumps({"type": "delete", "ids": ["1"]}, ensure_ascii=False)
+        + "\n"
+    ).encode("utf-8")
+    for size in (1, 3, 7, len(stream)):
+        decoder = EventDecoder()
+        events = []
+        for i in range(0, len(stream), size):
+            events.extend(decoder.feed(stream[i : i + size]))
+        assert [event["type"] for event in events] == ["create", "delete"]
+
+
+def test_event_decoder_splits_multibyte_characters():
+    data = json.dumps({"name": "服务"}, ensure_ascii=False).encode("utf-8")
+    decoder = EventDecoder()
+    events = []
+    for i in range(len(data)):
+        events.extend(decoder.feed(data[i : i + 1]))
+    assert events == [{"name": "服务"}]
+
+
+def test_event_decoder_braces_in_strings():
+    decoder = EventDecoder()
+    assert decoder.feed(b'{"message": "a } b') == []
+    assert decoder.feed(b' { c"}\n{"id"') == [{"message": "a } b { c"}]
+    assert decoder.feed(b': "1"}') == [{"id": "1"}]
+
+
+def test_event_decoder_size_cap():
+    decoder = EventDecoder(max_event_size=16)
+    assert decoder.feed(b'{"id": "1"}{"name": "') == [{"id": "1"}]
+    with pytest.raises(EventTooLargeError):
+        decoder.feed(b"x" * 32)
+    # The buffer is dropped, so a reconnected stream decodes again.
+    assert decoder.feed(b'{"id": "2"}') == [{"id": "2"}]
+
+
+def test_first_array_item():
+    data = b'{"pagination": {}, "items": [{"id": "1"}, {"id": "2"}]}'
+    assert first_array_item(data[i : i + 4] for i in range(0, 60, 4)) == {
+        "id": "1"
+    }
+    assert first_array_item([b'{"items": [ ]}']) is None
+    assert first_array_item([b'{"other": 1}']) is None
+
+
+def test_service_state_table():
+    table = ServiceStateTable()
+    assert table.reset([{"id": "1"}, {"id": "2"}]) == [
+        ("create", {"id": "1"}),
+        ("create", {"id": "2"}),
+    ]
+    assert table.apply({"type": "update", "items": [{"id": "1", "v": 2}]})
+    assert table.apply({"type": "delete", "ids": ["2"]}) == [
+        ("delete", {"id": "2"})
+    ]
+    assert table.reset([{"id": "1", "v": 2}, {"id": "3"}]) == [
+        ("create", {"id": "3"})
+    ]
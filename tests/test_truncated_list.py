@@ -0,0 +1,58 @@
+from walrus.tools.base.tools import (
+    decode_continue_token,
+    encode_continue_token,
+    truncated_list,
+)
+
+
+def paginate(items, total=None):
+    def iterate(limit=0, offset=0, pagination=None):
+        if pagination is not None and total is not None:
+            pagination["total"] = total
+        return iter(items[offset : offset + limit])
+
+    return iterate
+
+
+def test_continue_token_round_trip():
+    token = encode_continue_token(50, project_id="p", environment_id="e")
+    assert decode_continue_token(token) == {
+        "offset": 50,
+        "project_id": "p",
+        "environment_id": "e",
+    }
+    assert decode_continue_token(f" {token}\n")["offset"] == 50
+
+
+def test_decode_invalid_continue_token():
+    assert decode_continue_token("") == {}
+    assert decode_continue_token("not a token") == {}
+    assert decode_continue_token(encode_continue_token("1")) == {}
+
+
+def test_truncated_list_continues_from_token():
+    items = [{"id": str(i)} for i in range(5)]
+    first = truncated_list(paginate(items, total=5), limit=2, project_id="p")
+    assert first["items"] == items[:2]
+    assert first["count"] == 5
+    assert first["truncated"]
+
+    token = decode_continue_token(first["continue"])
+    assert token["project_id"] == "p"
+    second = truncated_list(
+        paginate(items, total=5), offset=token["offset"], limit=2
+    )
+    assert second["items"] == items[2:4]
+
+    token = decode_continue_token(second["continue"])
+    assert (
+        truncated_list(paginate(items), offset=token["offset"], limit=2)
+        == items[4:]
+    )
+
+
+def test_truncated_list_without_total():
+    items = [{"id": str(i)} for i in range(3)]
+    result = truncated_list(paginate(items), limit=2)
+    assert "count" not in result
+    assert result["returned"] == 2
@@ -7,4 +7,11 @@ class RequireApprovalTool(BaseTool):
     """Tool that requires human approval."""
 
     def __init__(self, **data: Any) -> None:
-        super().__init__(callbacks=[ApprovalCallbackHandler()], **data)
+        super().__init__(
+            callbacks=[ApprovalCallbackHandler(preview=self.preview)], **data
+        )
+
+    def preview(self, tool_input: str) -> str:
+        """Describe what the action will do, shown when asking for
+        approval."""
+        return ""
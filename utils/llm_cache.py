@@ -0,0 +1,110 @@
+"""Persistent cache of LLM completions."""
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+from typing import Any, Optional
+
+from langchain.cache import RETURN_VAL_TYPE, BaseCache
+from langchain.load.dump import dumps
+from langchain.load.load import loads
+
+logger = logging.getLogger(__name__)
+
+# Max number of cached completions.
+DEFAULT_MAX_ENTRIES = 1000
+# Seconds a cached completion is used.
+DEFAULT_MAX_AGE = 7 * 24 * 3600
+
+
+class SQLiteLLMCache(BaseCache):
+    """LLM cache in a SQLite file, keyed by a hash of the model, its
+    parameters and the prompt. Least recently used completions are evicted
+    over max_entries, and completions older than max_age are not used."""
+
+    def __init__(
+        self,
+        path: str,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+        max_age: int = DEFAULT_MAX_AGE,
+    ):
+        self.max_entries = max_entries
+        self.max_age = max_age
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        with self._connection:
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS completions ("
+                "key TEXT PRIMARY KEY, generations TEXT NOT NULL, "
+                "created_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+            )
+
+    def _key(self, prompt: str, llm_string: str) -> str:
+        return hashlib.sha256(
+            f"{llm_string}\n{prompt}".encode("utf-8")
+        ).hexdigest()
+
+    def lookup(
+        self, prompt: str, llm_string: str
+    ) -> Optional[RETURN_VAL_TYPE]:
+        key = self._key(prompt, llm_string)
+        now = time.time()
+        with self._lock, self._connection:
+            row = self._connection.execute(
+                "SELECT generations FROM completions "
+                "WHERE key = ? AND created_at > ?",
+                (key, now - self.max_age),
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self._connection.execute(
+                "UPDATE completions SET accessed_at = ? WHERE key = ?",
+                (now, key),
+            )
+            self.hits += 1
+
+        try:
+            return [loads(generation) for generation in json.loads(row[0])]
+        except Exception as e:
+            logger.debug(f"Failed to load cached completion: {e}")
+            return None
+
+    def update(
+        self, prompt: str, llm_string: str, return_val: RETURN_VAL_TYPE
+    ) -> None:
+        key = self._key(prompt, llm_string)
+        generations = json.dumps(
+            [dumps(generation) for generation in return_val]
+        )
+        now = time.time()
+        with self._lock, self._connection:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO completions VALUES (?, ?, ?, ?)",
+                (key, generations, now, now),
+            )
+            self._connection.execute(
+                "DELETE FROM completions WHERE created_at <= ?",
+                (now - self.max_age,),
+            )
+            self._connection.execute(
+                "DELETE FROM completions WHERE key NOT IN ("
+                "SELECT key FROM completions "
+                "ORDER BY accessed_at DESC LIMIT ?)",
+                (self.max_entries,),
+            )
+
+    def clear(self, **kwargs: Any) -> None:
+        with self._lock, self._connection:
+            self._connection.execute("DELETE FROM completions")
+
+    def stats(self) -> dict:
+        with self._lock:
+            entries = self._connection.execute(
+                "SELECT COUNT(*) FROM completions"
+            ).fetchone()[0]
+        return {"hits": self.hits, "misses": self.misses, "entries": entries}
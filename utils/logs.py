@@ -0,0 +1,59 @@
+"""Bounded processing of streamed log lines."""
+import re
+from collections import deque
+from typing import Iterable, Optional
+
+ERROR_PATTERN = re.compile(
+    r"\b(error|errors|err|fatal|panic|exception|traceback|failed|failure|"
+    r"crash|crashloopbackoff|oomkilled|refused|denied|timeout|timed out)\b",
+    re.IGNORECASE,
+)
+
+
+def tail(
+    lines: Iterable[str], size: int, pattern: Optional[str] = None
+) -> list[str]:
+    """Keep the last size lines in a ring buffer, optionally only the lines
+    matching a regex."""
+    regex = re.compile(pattern) if pattern else None
+    buffer = deque(maxlen=size)
+    for line in lines:
+        if regex is None or regex.search(line):
+            buffer.append(line)
+    return list(buffer)
+
+
+def error_excerpt(
+    lines: Iterable[str], max_lines: int = 100, context: int = 5
+) -> list[str]:
+    """Excerpt lines around error lines, with up to context lines before and
+    after each. Only the latest max_lines lines of the excerpt are kept.
+    Falls back to the last max_lines lines if there are no errors."""
+    recent = deque(maxlen=max_lines)
+    before = deque(maxlen=context)
+    excerpt = deque(maxlen=max_lines)
+    after = 0
+    has_error = False
+    gap = False
+    for line in lines:
+        recent.append(line)
+        if ERROR_PATTERN.search(line):
+            has_error = True
+            if gap and len(excerpt) > 0:
+                excerpt.append("...")
+            excerpt.extend(before)
+            excerpt.append(line)
+            before.clear()
+            after = context
+            gap = False
+        elif after > 0:
+            excerpt.append(line)
+            after -= 1
+        else:
+            if len(before) == context:
+                gap = True
+            before.append(line)
+
+    if not has_error:
+        return list(recent)
+    return list(excerpt)
@@ -0,0 +1,22 @@
+"""Helpers for lists of records in tool outputs."""
+
+
+def flatten(item: dict, prefix: str = "", flat: dict = None) -> dict:
+    """Flatten nested objects into dotted keys. Empty objects are kept as
+    values."""
+    if flat is None:
+        flat = {}
+    for key, value in item.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict) and value:
+            flatten(value, f"{name}.", flat)
+        else:
+            flat[name] = value
+    return flat
+
+
+def clip(text: str, limit: int) -> str:
+    """Clip text to the limit, marking the cut with an ellipsis."""
+    if len(text) <= limit:
+        return text
+    return text[: limit - 3] + "..."
@@ -0,0 +1,80 @@
+"""Lexical search with BM25 ranking."""
+import math
+import re
+from collections import Counter
+from typing import Generic, Sequence, TypeVar
+
+T = TypeVar("T")
+
+_word_pattern = re.compile(r"[A-Za-z0-9]+")
+_camel_case_pattern = re.compile(r"(?<=[a-z0-9])(?=[A-Z])")
+
+
+def tokenize(text: str) -> list[str]:
+    """Split text into lowercase words. Splits camelCase, snake_case and
+    kebab-case words as well."""
+    tokens = []
+    for word in _word_pattern.findall(text):
+        for part in _camel_case_pattern.split(word):
+            tokens.append(part.lower())
+    return tokens
+
+
+class BM25Index(Generic[T]):
+    """BM25 index over a fixed set of items."""
+
+    def __init__(
+        self,
+        items: Sequence[T],
+        documents: Sequence[str],
+        k1: float = 1.5,
+        b: float = 0.75,
+    ):
+        self.items = list(items)
+        self.k1 = k1
+        self.b = b
+        self._term_frequencies = [Counter(tokenize(d)) for d in documents]
+        self._lengths = [sum(tf.values()) for tf in self._term_frequencies]
+        self._average_length = (
+            sum(self._lengths) / len(self._lengths) if self._lengths else 0
+        )
+        document_frequencies = Counter()
+        for term_frequency in self._term_frequencies:
+            document_frequencies.update(term_frequency.keys())
+        total = len(self.items)
+        self._idf = {
+            term: math.log(1 + (total - df + 0.5) / (df + 0.5))
+            for term, df in document_frequencies.items()
+        }
+
+    def scores(self, query: str) -> list[float]:
+        terms = set(tokenize(query))
+        scores = []
+        for term_frequency, length in zip(
+            self._term_frequencies, self._lengths
+        ):
+            score = 0.0
+            norm = self.k1 * (
+                1 - self.b + self.b * length / (self._average_length or 1)
+            )
+            for term in terms:
+                frequency = term_frequency.get(term, 0)
+                if frequency == 0:
+                    continue
+                score += (
+                    self._idf[term]
+                    * frequency
+                    * (self.k1 + 1)
+                    / (frequency + norm)
+                )
+            scores.append(score)
+        return scores
+
+    def search(self, query: str, top_k: int) -> list[tuple[T, float]]:
+        """Get the top k items with positive scores, best first."""
+        ranked = sorted(
+            zip(self.items, self.scores(query)),
+            key=lambda pair: pair[1],
+            reverse=True,
+        )
+        return [(item, score) for item, score in ranked[:top_k] if score > 0]
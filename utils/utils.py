@@ -39,6 +39,24 @@ def get_env_bool(key: str, default: bool = False) -> bool:
         return env.lower() in ["1", "true", "yes", "on"]
 
 
+def count_tokens(text: str) -> int:
+    """Estimate the number of LLM tokens of a text, about 4 characters each."""
+    return (len(text) + 3) // 4
+
+
+def state_path(*paths: str) -> str:
+    """Get a path in the local state directory, creating the directory if
+    needed. State persists across sessions."""
+    state_directory = get_env(
+        "APPILOT_STATE_DIR", os.path.join(os.path.expanduser("~"), ".appilot")
+    )
+    path = os.path.join(state_directory, *paths)
+    directory = os.path.dirname(path)
+    if not os.path.exists(directory):
+        os.makedirs(directory)
+    return path
+
+
 def print_ai_reasoning(message):
     print(Fore.CYAN + text.get("ai_reasoning") + message + Style.RESET_ALL)
 
@@ -0,0 +1,143 @@
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+from pydantic import BaseModel
+
+# Names of entry files, so other files in the directory are left alone.
+_file_name = re.compile(r"[0-9a-f]{64}\.json")
+
+
+class CacheEntry(BaseModel):
+    """A cached API response with its validators."""
+
+    body: str
+    etag: str = ""
+    last_modified: str = ""
+    expires_at: float = 0
+
+    def is_fresh(self) -> bool:
+        return time.time() < self.expires_at
+
+
+class ResponseCache:
+    """LRU cache of API responses, optionally persisted to a directory.
+    Files of entries evicted from the LRU are removed, and the directory is
+    pruned to the most recent max_entries files when the cache is created,
+    so it holds at most twice max_entries files."""
+
+    def __init__(self, max_entries: int = 256, cache_dir: str = ""):
+        self.max_entries = max_entries
+        self.cache_dir = cache_dir
+        self._entries: OrderedDict[str, CacheEntry] = OrderedDict()
+        self._lock = threading.Lock()
+        if cache_dir != "" and not os.path.exists(cache_dir):
+            os.makedirs(cache_dir)
+        self._prune()
+
+    def get(self, key: str) -> Optional[CacheEntry]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                return entry
+
+        entry = self._load(key)
+        if entry is not None:
+            self._remember(key, entry)
+        return entry
+
+    def put(self, key: str, entry: CacheEntry):
+        self._remember(key, entry)
+        self._save(key, entry)
+
+    def invalidate(self, prefix: str = ""):
+        """Drop entries whose key starts with the prefix."""
+        with self._lock:
+            for key in list(self._entries.keys()):
+                if key.startswith(prefix):
+                    del self._entries[key]
+
+        if self.cache_dir == "":
+            return
+        for file_name in os.listdir(self.cache_dir):
+            file_path = os.path.join(self.cache_dir, file_name)
+            try:
+                with open(file_path) as file:
+                    key = json.load(file).get("key", "")
+            except Exception:
+                continue
+            if key.startswith(prefix):
+                os.remove(file_path)
+
+    def _remember(self, key: str, entry: CacheEntry):
+        evicted = []
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                evicted_key, _ = self._entries.popitem(last=False)
+                evicted.append(evicted_key)
+        for evicted_key in evicted:
+            self._remove(evicted_key)
+
+    def _prune(self):
+        """Remove all but the most recently written max_entries files."""
+        if self.cache_dir == "":
+            return
+        file_paths = []
+        for file_name in os.listdir(self.cache_dir):
+            if not _file_name.fullmatch(file_name):
+                continue
+            file_path = os.path.join(self.cache_dir, file_name)
+            try:
+                file_paths.append((os.path.getmtime(file_path), file_path))
+            except OSError:
+                continue
+        file_paths.sort(reverse=True)
+        for _, file_path in file_paths[self.max_entries :]:
+            try:
+                os.remove(file_path)
+            except OSError:
+                pass
+
+    def _remove(self, key: str):
+        if self.cache_dir == "":
+            return
+        try:
+            os.remove(self._file_path(key))
+        except OSError:
+            pass
+
+    def _file_path(self, key: str) -> str:
+        digest = hashlib.sha256(key.encode("utf-8")).hexdigest()
+        return os.path.join(self.cache_dir, f"{digest}.json")
+
+    def _load(self, key: str) -> Optional[CacheEntry]:
+        if self.cache_dir == "":
+            return None
+        try:
+            with open(self._file_path(key)) as file:
+                data = json.load(file)
+        except Exception:
+            return None
+        if data.get("key") != key:
+            return None
+        return CacheEntry(**data["entry"])
+
+    def _save(self, key: str, entry: CacheEntry):
+        if self.cache_dir == "":
+            return
+        file_path = self._file_path(key)
+        try:
+            # Write then rename so readers never see a partial file.
+            with open(file_path + ".tmp", "w") as file:
+                json.dump({"key": key, "entry": entry.dict()}, file)
+            os.replace(file_path + ".tmp", file_path)
+        except OSError:
+            pass
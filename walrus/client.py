@@ -1,17 +1,52 @@
+import hashlib
 import json
-from typing import List
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterator, List, Optional
+from urllib.parse import urlencode
 import click
 import requests
 from i18n import text
 from utils import utils
+from walrus.cache import CacheEntry, ResponseCache
+from walrus.stream import (
+    EventDecoder,
+    EventTooLargeError,
+    ServiceStateTable,
+    first_array_item,
+)
+
+logger = logging.getLogger(__name__)
+
+# Seconds a cached response is served before revalidating with the server.
+PROJECTS_CACHE_TTL = 60
+ENVIRONMENTS_CACHE_TTL = 30
+TEMPLATES_CACHE_TTL = 300
+TEMPLATE_VERSIONS_CACHE_TTL = 300
+
+DEFAULT_PAGE_SIZE = 100
+
+# Seconds without data before a watch stream is reconnected.
+WATCH_READ_TIMEOUT = 300
+WATCH_MAX_RETRY_INTERVAL = 30
+# Consecutive failures to connect a watch stream before giving up.
+WATCH_MAX_RETRIES = 10
 
 
 class WalrusClient:
     """HTTP client for Walrus API."""
 
-    def __init__(self, api_url: str, api_key: str, **kwargs):
+    def __init__(
+        self,
+        api_url: str,
+        api_key: str,
+        cache: Optional[ResponseCache] = None,
+        **kwargs,
+    ):
         self.api_url = api_url
         self.api_key = api_key
+        self.cache = cache if cache is not None else ResponseCache()
         self.request_args = kwargs
 
     def headers(self):
@@ -21,18 +56,137 @@ class WalrusClient:
             "Content-Type": "application/json",
         }
 
-    def list_projects(self):
-        """List projects."""
+    def cache_key(self, path: str) -> str:
+        """Get the cache key of a path, scoped to the server and the API key,
+        as persisted responses may be shared by other servers and users."""
+        credential = hashlib.sha256(self.api_key.encode("utf-8")).hexdigest()
+        return f"{self.api_url}#{credential[:16]}{path}"
+
+    def get_cached(self, path: str, params: dict, ttl: float, error: str):
+        """GET a path through the response cache and return the parsed body.
+        Expired entries are revalidated with ETag or Last-Modified."""
+        key = self.cache_key(path)
+        if params:
+            key += "?" + urlencode(sorted(params.items()))
+
+        entry = self.cache.get(key)
+        if entry is not None and entry.is_fresh():
+            return json.loads(entry.body)
+
+        headers = self.headers()
+        if entry is not None and entry.etag != "":
+            headers["If-None-Match"] = entry.etag
+        if entry is not None and entry.last_modified != "":
+            headers["If-Modified-Since"] = entry.last_modified
+
         response = requests.get(
-            url=self.api_url + "/v1/projects",
-            params={"perPage": -1},
-            headers=self.headers(),
+            url=self.api_url + path,
+            params=params,
+            headers=headers,
             **self.request_args,
         )
+        if response.status_code == 304 and entry is not None:
+            entry.expires_at = time.time() + ttl
+            self.cache.put(key, entry)
+            return json.loads(entry.body)
         if response.status_code >= 400:
-            raise Exception(f"Failed to list projects: {response.text}")
+            raise Exception(f"{error}: {response.text}")
+
+        self.cache.put(
+            key,
+            CacheEntry(
+                body=response.text,
+                etag=response.headers.get("ETag", ""),
+                last_modified=response.headers.get("Last-Modified", ""),
+                expires_at=time.time() + ttl,
+            ),
+        )
+        return response.json()
 
-        return response.json()["items"]
+    def get_json(
+        self,
+        path: str,
+        params: dict,
+        error: str,
+        timeout: Optional[float] = None,
+    ):
+        """GET a path and return the parsed body."""
+        request_args = self.request_args
+        if timeout is not None:
+            request_args = {**request_args, "timeout": timeout}
+
+        response = requests.get(
+            url=self.api_url + path,
+            params=params,
+            headers=self.headers(),
+            **request_args,
+        )
+        if response.status_code >= 400:
+            raise Exception(f"{error}: {response.text}")
+
+        return response.json()
+
+    def paginate(
+        self,
+        path: str,
+        error: str,
+        params: Optional[dict] = None,
+        page_size: int = DEFAULT_PAGE_SIZE,
+        limit: int = 0,
+        offset: int = 0,
+        ttl: float = 0,
+        timeout: Optional[float] = None,
+        pagination: Optional[dict] = None,
+    ) -> Iterator[dict]:
+        """Iterate items of a list API page by page, starting from offset.
+        Stops after limit items if limit is positive. Pages are served from
+        the response cache if ttl is positive. The pagination metadata of
+        the pages read, e.g. the total, is updated into pagination if
+        given."""
+        page = offset // page_size + 1
+        skip = offset % page_size
+        count = 0
+        while True:
+            page_params = {
+                **(params or {}),
+                "page": page,
+                "perPage": page_size,
+            }
+            if ttl > 0:
+                body = self.get_cached(path, page_params, ttl, error)
+            else:
+                body = self.get_json(path, page_params, error, timeout)
+            if pagination is not None:
+                pagination.update(body.get("pagination") or {})
+
+            items = body.get("items") or []
+            for item in items[skip:]:
+                yield item
+                count += 1
+                if limit > 0 and count >= limit:
+                    return
+            skip = 0
+
+            total_page = (body.get("pagination") or {}).get("totalPage")
+            # Stop on the last page, or when the server ignores the page size.
+            if len(items) != page_size:
+                return
+            if total_page is not None and page >= total_page:
+                return
+            page += 1
+
+    def iter_projects(self, **kwargs) -> Iterator[dict]:
+        """Iterate projects. Accepts paginate arguments."""
+        return self.paginate(
+            "/v1/projects",
+            error="Failed to list projects",
+            ttl=PROJECTS_CACHE_TTL,
+            **kwargs,
+        )
+
+    def list_projects(self):
+        """List projects."""
+        return list(self.iter_projects())
 
     def get_project(self, project: str):
         """Get a project by id or name."""
@@ -48,21 +202,18 @@ class WalrusClient:
 
         return response.json()
 
-    def list_environments(self, project_id: str):
-        """List environments."""
-        params = {
-            "perPage": -1,
-        }
-        response = requests.get(
-            url=self.api_url + f"/v1/projects/{project_id}/environments",
-            params=params,
-            headers=self.headers(),
-            **self.request_args,
+    def iter_environments(self, project_id: str, **kwargs) -> Iterator[dict]:
+        """Iterate environments. Accepts paginate arguments."""
+        return self.paginate(
+            f"/v1/projects/{project_id}/environments",
+            error="Failed to list environments",
+            ttl=ENVIRONMENTS_CACHE_TTL,
+            **kwargs,
         )
-        if response.status_code >= 400:
-            raise Exception(f"Failed to list environments: {response.text}")
 
-        return response.json()["items"]
+    def list_environments(self, project_id: str):
+        """List environments."""
+        return list(self.iter_environments(project_id))
 
     def get_environment(self, project_id: str, environment: str):
         """Get an environment by id or name."""
@@ -91,6 +242,10 @@ class WalrusClient:
         if response.status_code >= 400:
             raise Exception(f"Failed to create environment: {response.text}")
 
+        self.cache.invalidate(
+            self.cache_key(f"/v1/projects/{project_id}/environments")
+        )
+
         return response.text
 
     def delete_environments(self, project_id: str, ids: List[str]):
@@ -109,6 +264,10 @@ class WalrusClient:
         if response.status_code >= 400:
             raise Exception(f"Failed to delete environment: {response.text}")
 
+        self.cache.invalidate(
+            self.cache_key(f"/v1/projects/{project_id}/environments")
+        )
+
         return response.text
 
     def get_environment_graph(self, project_id: str, environment_id: str):
@@ -126,23 +285,83 @@ class WalrusClient:
 
         return response.json()
 
+    def iter_services(
+        self, project_id: str, environment_id: str, **kwargs
+    ) -> Iterator[dict]:
+        """Iterate services in a project and environment. Accepts paginate
+        arguments."""
+        return self.paginate(
+            f"/v1/projects/{project_id}/environments/{environment_id}/services",
+            error="Failed to list services",
+            **kwargs,
+        )
+
     def list_services(self, project_id: str, environment_id: str):
         """List services in a project and environment."""
-        params = {
-            "perPage": -1,
-        }
+        return list(self.iter_services(project_id, environment_id))
 
-        response = requests.get(
-            url=self.api_url
-            + f"/v1/projects/{project_id}/environments/{environment_id}/services",
-            params=params,
-            headers=self.headers(),
-            **self.request_args,
+    def stream_service_events(
+        self,
+        project_id: str,
+        environment_id: str,
+        read_timeout: float = WATCH_READ_TIMEOUT,
+    ) -> Iterator[dict]:
+        """Stream service events in a project and environment. Reconnects when
+        the stream breaks. A reset event with all services is yielded on each
+        connection, so consumers can resync what they missed. Gives up after
+        WATCH_MAX_RETRIES consecutive failures to connect."""
+        path = (
+            f"/v1/projects/{project_id}/environments/{environment_id}/services"
         )
-        if response.status_code >= 400:
-            raise Exception(f"Failed to list services: {response.text}")
-
-        return response.json()["items"]
+        request_args = {**self.request_args, "timeout": (10, read_timeout)}
+        retry_interval = 1
+        failures = 0
+        error = ""
+        while True:
+            try:
+                response = requests.get(
+                    url=self.api_url + path,
+                    params={"watch": "true"},
+                    headers=self.headers(),
+                    **request_args,
+                    stream=True,
+                )
+                with response:
+                    if 400 <= response.status_code < 500:
+                        raise Exception(
+                            f"Failed to watch services: {response.text}"
+                        )
+                    if response.status_code < 400:
+                        # List after the watch is established to miss nothing.
+                        services = self.list_services(
+                            project_id, environment_id
+                        )
+                        retry_interval = 1
+                        failures = 0
+                        yield {"type": "reset", "items": services}
+
+                        decoder = EventDecoder()
+                        for chunk in response.iter_content(chunk_size=None):
+                            for event in decoder.feed(chunk):
+                                yield event
+                    else:
+                        error = f"{response.status_code} {response.text}"
+                        logger.debug(f"Failed to watch services: {error}")
+            except (
+                requests.exceptions.ConnectionError,
+                requests.exceptions.ChunkedEncodingError,
+                requests.exceptions.Timeout,
+                EventTooLargeError,
+            ) as e:
+                error = str(e)
+                logger.debug(f"Service watch stream broken: {e}")
+
+            failures += 1
+            if failures > WATCH_MAX_RETRIES:
+                raise Exception(f"Failed to watch services: {error}")
+
+            time.sleep(retry_interval)
+            retry_interval = min(retry_interval * 2, WATCH_MAX_RETRY_INTERVAL)
 
     def watch_services(self, project_id: str, environment_id: str):
         """Watch services in a project and environment."""
@@ -151,17 +370,16 @@ class WalrusClient:
             aligned_data = [item.ljust(width) for item in data_list]
             click.echo("".join(aligned_data))
 
-        def print_service(s):
+        def print_service(s, status=None):
             align_and_echo(
                 [
                     s.get("name"),
-                    s.get("template").get("name"),
-                    s.get("status").get("summaryStatus"),
+                    (s.get("template") or {}).get("name", ""),
+                    status or (s.get("status") or {}).get("summaryStatus", ""),
                     utils.format_relative_time(s.get("createTime")),
                 ]
             )
 
-        services = self.list_services(project_id, environment_id)
         click.echo(text.get("watch_service_note"))
         align_and_echo(
             [
@@ -171,57 +389,68 @@ class WalrusClient:
                 "CREATE TIME",
             ]
         )
-        for service in services:
-            print_service(service)
-
-        params = {
-            "perPage": -1,
-            "watch": "true",
-        }
 
-        response = requests.get(
-            url=self.api_url
-            + f"/v1/projects/{project_id}/environments/{environment_id}/services",
-            params=params,
-            headers=self.headers(),
-            **self.request_args,
-            stream=True,
-        )
-        if response.status_code >= 400:
-            raise Exception(f"Failed to list services: {response.text}")
+        table = ServiceStateTable()
+        for event in self.stream_service_events(project_id, environment_id):
+            if event.get("type") == "reset":
+                changes = table.reset(event["items"])
+            else:
+                changes = table.apply(event)
 
-        for chunk in response.iter_content(chunk_size=None):
-            event = json.loads(chunk.decode("utf-8"))
-            if "items" in event:
-                for item in event["items"]:
-                    print_service(item)
+            for event_type, service in changes:
+                if event_type == "delete":
+                    print_service(service, "Deleted")
+                else:
+                    print_service(service)
 
-    def list_services_in_all_environments(self, project_id: str):
-        """List services in all environments of a project."""
-        params = {
-            "perPage": -1,
-        }
+    def list_services_in_all_environments(
+        self,
+        project_id: str,
+        max_workers: int = 8,
+        timeout: float = 10,
+    ):
+        """List services in all environments of a project concurrently.
+        Environments that fail to list are reported in errors."""
 
-        services = []
-        envs = self.list_environments(project_id)
-        for env in envs:
-            response = requests.get(
-                url=self.api_url
-                + f"/v1/projects/{project_id}/environments/{env['id']}/services",
-                params=params,
-                headers=self.headers(),
-                **self.request_args,
+        def list_services_in_environment(env):
+            return list(
+                self.iter_services(project_id, env["id"], timeout=timeout)
             )
-            if response.status_code >= 400:
-                raise Exception(f"Failed to list services: {response.text}")
 
-            services_in_env = response.json()["items"]
-            if services_in_env is None or len(services_in_env) == 0:
-                continue
-
-            services.extend(response.json()["items"])
-
-        return services
+        services = []
+        errors = []
+        envs = self.list_environments(project_id) or []
+        if len(envs) == 0:
+            return {"items": services, "errors": errors}
+
+        with ThreadPoolExecutor(
+            max_workers=min(max_workers, len(envs))
+        ) as executor:
+            futures = [
+                executor.submit(list_services_in_environment, env)
+                for env in envs
+            ]
+            for env, future in zip(envs, futures):
+                try:
+                    services_in_env = future.result()
+                except Exception as e:
+                    errors.append(
+                        {
+                            "environment": env.get("name"),
+                            "error": str(e),
+                        }
+                    )
+                    continue
+
+                for service in services_in_env:
+                    service["environment"] = {
+                        **(service.get("environment") or {}),
+                        "id": env.get("id"),
+                        "name": env.get("name"),
+                    }
+                services.extend(services_in_env)
+
+        return {"items": services, "errors": errors}
 
     def get_service_by_name(
         self, project_id: str, environment_id: str, service_name: str
@@ -252,6 +481,12 @@ class WalrusClient:
         if response.status_code >= 400:
             raise Exception(f"Failed to create service: {response.text}")
 
+        self.cache.invalidate(
+            self.cache_key(
+                f"/v1/projects/{project_id}/environments/{environment_id}"
+            )
+        )
+
         return response.text
 
     def update_service(self, project_id: str, environment_id: str, data):
@@ -271,6 +506,12 @@ class WalrusClient:
         if response.status_code >= 400:
             raise Exception(f"Failed to update service: {response.text}")
 
+        self.cache.invalidate(
+            self.cache_key(
+                f"/v1/projects/{project_id}/environments/{environment_id}"
+            )
+        )
+
         return response.text
 
     def delete_services(
@@ -292,6 +533,12 @@ class WalrusClient:
         if response.status_code >= 400:
             raise Exception(f"Failed to delete service: {response.text}")
 
+        self.cache.invalidate(
+            self.cache_key(
+                f"/v1/projects/{project_id}/environments/{environment_id}"
+            )
+        )
+
         return response.text
 
     def get_service_access_endpoints(
@@ -378,40 +625,91 @@ class WalrusClient:
 
         return response.text
 
-    def list_templates(self):
-        """List templates."""
+    def stream_service_resource_logs(
+        self,
+        project_id: str,
+        environment_id: str,
+        service_id: str,
+        service_resource_id: str,
+        key: str,
+        line_number: int,
+        follow: bool = False,
+    ) -> Iterator[str]:
+        """Stream log lines of a service resource. In follow mode, new lines
+        keep coming until the caller stops iterating."""
+        params = {
+            "key": key,
+            "tailLines": line_number,
+        }
+        if follow:
+            params["follow"] = "true"
+
         response = requests.get(
-            url=self.api_url + "/v1/templates",
-            params={"perPage": -1},
+            url=self.api_url
+            + f"/v1/projects/{project_id}/environments/{environment_id}/services/{service_id}/resources/{service_resource_id}/log",
+            params=params,
             headers=self.headers(),
             **self.request_args,
+            stream=True,
         )
-        if response.status_code >= 400:
-            raise Exception(f"Failed to list templates: {response.text}")
-
-        templates = response.json()["items"]
-        for template in templates:
+        with response:
+            if response.status_code >= 400:
+                raise Exception(
+                    f"Failed to get service resource logs: {response.text}"
+                )
+            if response.encoding is None:
+                response.encoding = "utf-8"
+            yield from response.iter_lines(decode_unicode=True)
+
+    def iter_templates(self, **kwargs) -> Iterator[dict]:
+        """Iterate templates. Accepts paginate arguments."""
+        for template in self.paginate(
+            "/v1/templates",
+            error="Failed to list templates",
+            ttl=TEMPLATES_CACHE_TTL,
+            **kwargs,
+        ):
             del template["createTime"]
             del template["updateTime"]
             del template["status"]
             del template["source"]
-        return json.dumps(templates)
+            yield template
+
+    def list_templates(self):
+        """List templates."""
+        return list(self.iter_templates())
 
     def get_template_version(self, template: str):
         """Get latest template version given template id or name."""
+        key = self.cache_key(f"/v1/templates/{template}/versions#latest")
+        entry = self.cache.get(key)
+        if entry is not None and entry.is_fresh():
+            return json.loads(entry.body)
+
+        # Ask for the newest version only. The first item is decoded from the
+        # stream in case the server ignores the page size.
+        params = {
+            "page": 1,
+            "perPage": 1,
+            "sort": "-createTime",
+        }
         response = requests.get(
             url=self.api_url + f"/v1/templates/{template}/versions",
-            params={"perPage": -1},
+            params=params,
             headers=self.headers(),
             **self.request_args,
+            stream=True,
         )
-        if response.status_code >= 400:
-            raise Exception(
-                f"Failed to list versions of template {template}: {response.text}"
+        with response:
+            if response.status_code >= 400:
+                raise Exception(
+                    f"Failed to list versions of template {template}: {response.text}"
+                )
+            template_version = first_array_item(
+                response.iter_content(chunk_size=8192)
             )
 
-        template_versions = response.json()["items"]
-        if len(template_versions) == 0:
+        if template_version is None:
             raise Exception("Template version not found")
 
         keys_to_remove = [
@@ -424,13 +722,18 @@ class WalrusClient:
             "source",
         ]
 
-        template_version = response.json()["items"][0]
         # remove keys that are not needed to make prompt neat
-
-        for key in keys_to_remove:
-            if key in template_version:
-                del template_version[key]
-            if key in template_version["schema"]:
-                del template_version["schema"][key]
-
-        return json.dumps(template_version)
+        for key_to_remove in keys_to_remove:
+            if key_to_remove in template_version:
+                del template_version[key_to_remove]
+            if key_to_remove in (template_version.get("schema") or {}):
+                del template_version["schema"][key_to_remove]
+
+        self.cache.put(
+            key,
+            CacheEntry(
+                body=json.dumps(template_version),
+                expires_at=time.time() + TEMPLATE_VERSIONS_CACHE_TTL,
+            ),
+        )
+        return template_version
@@ -1,7 +1,21 @@
+import json
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
 from pydantic import BaseModel
 
+from utils import utils
 from walrus.client import WalrusClient
 
+logger = logging.getLogger(__name__)
+
+# Seconds a resolved project or environment name is trusted.
+RESOLUTION_TTL = 600
+CONTEXT_FILE = "walrus_context.json"
+
 
 class Context(BaseModel):
     project_id: str = ""
@@ -13,45 +27,167 @@ class Context(BaseModel):
 GLOBAL_CONTEXT: Context
 
 
+def current_names() -> dict[str, str]:
+    """Get names of the current project and environment."""
+    return {
+        "project": GLOBAL_CONTEXT.project_name,
+        "environment": GLOBAL_CONTEXT.environment_name,
+    }
+
+
+class ResolutionCache:
+    """Cache of project and environment objects keyed by name and id."""
+
+    def __init__(self, ttl: float = RESOLUTION_TTL):
+        self.ttl = ttl
+        self._entries: dict[tuple, tuple[float, dict]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, *key: str) -> Optional[dict]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.time():
+                del self._entries[key]
+                return None
+            return value
+
+    def put(self, value: dict, *scope: str):
+        """Cache a project or environment under its name and id."""
+        expires_at = time.time() + self.ttl
+        with self._lock:
+            for identity in (value.get("id"), value.get("name")):
+                if identity:
+                    self._entries[(*scope, identity)] = (expires_at, value)
+
+    def invalidate(self, *scope: str):
+        """Drop entries whose key starts with the scope."""
+        with self._lock:
+            for key in list(self._entries.keys()):
+                if key[: len(scope)] == scope:
+                    del self._entries[key]
+
+
+RESOLUTION_CACHE = ResolutionCache()
+
+
+def resolve_project(walrus_client: WalrusClient, project: str) -> dict:
+    """Get a project by id or name, using the resolution cache."""
+    cached = RESOLUTION_CACHE.get("project", project)
+    if cached is not None:
+        return cached
+
+    resolved = walrus_client.get_project(project)
+    RESOLUTION_CACHE.put(resolved, "project")
+    return resolved
+
+
+def resolve_environment(
+    walrus_client: WalrusClient, project: str, environment: str
+) -> dict:
+    """Get an environment by id or name, using the resolution cache. Project
+    can be an id or a name as well."""
+    cached = RESOLUTION_CACHE.get("environment", project, environment)
+    if cached is not None:
+        return cached
+
+    resolved = walrus_client.get_environment(project, environment)
+    RESOLUTION_CACHE.put(resolved, "environment", project)
+    return resolved
+
+
+def invalidate_environments(project_id: str):
+    """Forget resolved environments of a project, e.g., after they are
+    created or deleted."""
+    RESOLUTION_CACHE.invalidate("environment", project_id)
+    project = RESOLUTION_CACHE.get("project", project_id)
+    if project is not None:
+        RESOLUTION_CACHE.invalidate("environment", project.get("name"))
+
+
 def set_default(
-    walrus_url: str,
-    walrus_api_key: str,
+    walrus_client: WalrusClient,
     default_project: str = "",
     default_environment: str = "",
 ) -> Context:
-    walrus_client = WalrusClient(
-        walrus_url,
-        walrus_api_key,
-        verify=False,
-    )
-    if default_project != "" and default_environment != "":
-        project = walrus_client.get_project(default_project)
-        environment = walrus_client.get_environment(
-            default_project, default_environment
+    saved = load_context(walrus_client.api_url)
+    if saved is not None and (
+        (default_project == "" and default_environment == "")
+        or (
+            default_project in (saved.project_id, saved.project_name)
+            and default_environment
+            in (saved.environment_id, saved.environment_name)
         )
+    ):
+        # Validate the last used context with a single call.
+        try:
+            environment = walrus_client.get_environment(
+                saved.project_id, saved.environment_id
+            )
+        except Exception as e:
+            logger.debug(f"Saved context is no longer valid: {e}")
+        else:
+            if environment.get("name") == saved.environment_name:
+                set_context(walrus_client, saved)
+                return GLOBAL_CONTEXT
+
+    if default_project != "" and default_environment != "":
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            project_future = executor.submit(
+                resolve_project, walrus_client, default_project
+            )
+            environment_future = executor.submit(
+                resolve_environment,
+                walrus_client,
+                default_project,
+                default_environment,
+            )
+            project = project_future.result()
+            environment = environment_future.result()
     else:
         # Get the first project and environment if not specified.
-        projects = walrus_client.list_projects()
+        projects = list(walrus_client.iter_projects(limit=1))
         if projects is None or len(projects) == 0:
             raise Exception("No available project. A project is required.")
         project = projects[0]
-        environments = walrus_client.list_environments(project.get("id"))
+        environments = list(
+            walrus_client.iter_environments(project.get("id"), limit=1)
+        )
         if environments is None or len(environments) == 0:
             raise Exception(
                 "No aviailable environment. An environment is required."
             )
         environment = environments[0]
 
+    set_context(
+        walrus_client,
+        Context(
+            project_id=project.get("id"),
+            project_name=project.get("name"),
+            environment_id=environment.get("id"),
+            environment_name=environment.get("name"),
+        ),
+    )
+    return GLOBAL_CONTEXT
+
+
+def set_context(walrus_client: WalrusClient, context: Context):
     global GLOBAL_CONTEXT
-    GLOBAL_CONTEXT = Context(
-        project_id=project.get("id"),
-        project_name=project.get("name"),
-        environment_id=environment.get("id"),
-        environment_name=environment.get("name"),
+    GLOBAL_CONTEXT = context
+    RESOLUTION_CACHE.put(
+        {"id": context.project_id, "name": context.project_name}, "project"
+    )
+    RESOLUTION_CACHE.put(
+        {"id": context.environment_id, "name": context.environment_name},
+        "environment",
+        context.project_id,
     )
+    save_context(walrus_client.api_url)
 
 
-def update_context(context):
+def update_context(context, walrus_url: str = ""):
     global GLOBAL_CONTEXT
     if (
         context.get("project_id") is not None
@@ -65,3 +201,33 @@ def update_context(context):
     ):
         GLOBAL_CONTEXT.environment_id = context.get("environment_id")
         GLOBAL_CONTEXT.environment_name = context.get("environment_name")
+    if walrus_url != "":
+        save_context(walrus_url)
+
+
+def load_context(walrus_url: str) -> Optional[Context]:
+    """Load the last used context of a Walrus server."""
+    try:
+        with open(utils.state_path(CONTEXT_FILE)) as file:
+            saved = json.load(file).get(walrus_url)
+    except Exception:
+        return None
+    if saved is None:
+        return None
+    return Context(**saved)
+
+
+def save_context(walrus_url: str):
+    """Save the current context as the last used one of a Walrus server."""
+    path = utils.state_path(CONTEXT_FILE)
+    try:
+        with open(path) as file:
+            contexts = json.load(file)
+    except Exception:
+        contexts = {}
+    contexts[walrus_url] = GLOBAL_CONTEXT.dict()
+    try:
+        with open(path, "w") as file:
+            json.dump(contexts, file)
+    except OSError as e:
+        logger.debug(f"Failed to save context: {e}")
@@ -0,0 +1,155 @@
+"""Collect what diagnosing a service needs in one pass."""
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+from utils import logs, utils
+from walrus.client import WalrusClient
+
+# Max tokens of a diagnosis bundle.
+DIAGNOSIS_TOKEN_BUDGET = 3000
+# Max number of components to get logs of.
+MAX_LOG_COMPONENTS = 6
+# Number of log lines scanned for errors per component.
+LOG_SCAN_LINES = 1000
+# Max number of log lines kept per component before budgeting.
+LOG_EXCERPT_LINES = 60
+
+
+def is_unhealthy(status: dict) -> bool:
+    return bool(status.get("error")) or bool(status.get("transitioning"))
+
+
+def status_text(status: dict) -> str:
+    text = status.get("summaryStatus") or "Unknown"
+    message = status.get("summaryStatusMessage")
+    if message:
+        text += f" ({' '.join(message.split())})"
+    return text
+
+
+def loggable_keys(keys) -> list[str]:
+    """Walk a keys response for loggable component keys."""
+    found = []
+
+    def walk(node):
+        if isinstance(node, list):
+            for item in node:
+                walk(item)
+        elif isinstance(node, dict):
+            if node.get("value") and node.get("loggable"):
+                found.append(node["value"])
+            for value in node.values():
+                if isinstance(value, (list, dict)):
+                    walk(value)
+
+    walk(keys)
+    return found
+
+
+def clip_lines(lines: list[str], token_budget: int) -> list[str]:
+    """Keep the latest lines within the token budget."""
+    kept = []
+    used = 0
+    for line in reversed(lines):
+        used += utils.count_tokens(line) + 1
+        if used > token_budget:
+            break
+        kept.append(line)
+    kept.reverse()
+    return kept
+
+
+def diagnose_service(
+    walrus_client: WalrusClient,
+    project_id: str,
+    environment_id: str,
+    service_id: str,
+    token_budget: int = DIAGNOSIS_TOKEN_BUDGET,
+    max_workers: int = 8,
+) -> str:
+    """Get status, resources and log excerpts of unhealthy components of a
+    service as one text bundle within the token budget. Components of all
+    resources are checked when no resource is unhealthy."""
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        service_future = executor.submit(
+            walrus_client.get_service_by_name,
+            project_id,
+            environment_id,
+            service_id,
+        )
+        resources = walrus_client.list_service_resources(
+            project_id, environment_id, service_id
+        )
+        service = service_future.result()
+
+        suspects = [
+            r for r in resources if is_unhealthy(r.get("status") or {})
+        ] or resources
+
+        def get_keys(resource):
+            keys = walrus_client.get_service_resource_keys(
+                project_id, environment_id, service_id, resource["id"]
+            )
+            return loggable_keys(json.loads(keys))
+
+        components = []
+        key_futures = [
+            (resource, executor.submit(get_keys, resource))
+            for resource in suspects
+        ]
+        for resource, future in key_futures:
+            try:
+                keys = future.result()
+            except Exception:
+                continue
+            components.extend((resource, key) for key in keys)
+        omitted = max(len(components) - MAX_LOG_COMPONENTS, 0)
+        components = components[:MAX_LOG_COMPONENTS]
+
+        def get_log(resource, key):
+            lines = walrus_client.stream_service_resource_logs(
+                project_id,
+                environment_id,
+                service_id,
+                resource["id"],
+                key,
+                LOG_SCAN_LINES,
+            )
+            return logs.error_excerpt(lines, LOG_EXCERPT_LINES)
+
+        log_futures = [
+            (resource, key, executor.submit(get_log, resource, key))
+            for resource, key in components
+        ]
+
+        bundle = [
+            f"service: {service.get('name', service_id)}",
+            f"status: {status_text(service.get('status') or {})}",
+            "resources:",
+        ]
+        for resource in resources:
+            bundle.append(
+                f"- {resource.get('type', '')}/{resource.get('name', '')} "
+                f"(id: {resource.get('id', '')}): "
+                f"{status_text(resource.get('status') or {})}"
+            )
+
+        sections = []
+        for resource, key, future in log_futures:
+            try:
+                lines = future.result()
+            except Exception as e:
+                lines = [f"Failed to get logs: {e}"]
+            sections.append((f"logs of {key}:", lines or ["(empty)"]))
+
+    used = utils.count_tokens("\n".join(bundle))
+    for i, (title, lines) in enumerate(sections):
+        # Share what is left of the budget among the remaining sections.
+        share = (token_budget - used) // (len(sections) - i)
+        lines = clip_lines(lines, share - utils.count_tokens(title) - 2)
+        section = [title, "```", *lines, "```"]
+        used += utils.count_tokens("\n".join(section))
+        bundle.extend(section)
+    if omitted > 0:
+        bundle.append(f"({omitted} more components without logs)")
+    return "\n".join(bundle)
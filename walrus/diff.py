@@ -0,0 +1,135 @@
+"""Compare services of environments."""
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+from walrus.client import WalrusClient
+
+# Max characters of a value shown in a diff.
+VALUE_LIMIT = 120
+
+
+def template_of(service: dict) -> str:
+    template = service.get("template") or {}
+    return f"{template.get('name', '')}@{template.get('version', '')}"
+
+
+def diff_values(left, right, path: str = "") -> list[tuple]:
+    """Get (path, left, right) of each differing leaf. Lists are compared as
+    a whole. A missing key shows as None."""
+    if isinstance(left, dict) and isinstance(right, dict):
+        changes = []
+        for key in sorted(set(left) | set(right)):
+            changes.extend(
+                diff_values(
+                    left.get(key),
+                    right.get(key),
+                    f"{path}.{key}" if path else key,
+                )
+            )
+        return changes
+    if left != right:
+        return [(path, left, right)]
+    return []
+
+
+def diff_services(left: list[dict], right: list[dict]) -> dict:
+    """Match services by name and diff their templates and attributes."""
+    left_by_name = {service["name"]: service for service in left}
+    right_by_name = {service["name"]: service for service in right}
+
+    changed = []
+    identical = 0
+    for name in sorted(left_by_name.keys() & right_by_name.keys()):
+        left_service = left_by_name[name]
+        right_service = right_by_name[name]
+        change = {"name": name}
+        if template_of(left_service) != template_of(right_service):
+            change["template"] = (
+                template_of(left_service),
+                template_of(right_service),
+            )
+        attributes = diff_values(
+            left_service.get("attributes") or {},
+            right_service.get("attributes") or {},
+        )
+        if attributes:
+            change["attributes"] = attributes
+        if len(change) > 1:
+            changed.append(change)
+        else:
+            identical += 1
+
+    return {
+        "only_left": [
+            left_by_name[name]
+            for name in sorted(left_by_name.keys() - right_by_name.keys())
+        ],
+        "only_right": [
+            right_by_name[name]
+            for name in sorted(right_by_name.keys() - left_by_name.keys())
+        ],
+        "changed": changed,
+        "identical": identical,
+    }
+
+
+def format_value(value) -> str:
+    if value is None:
+        return "(unset)"
+    text = json.dumps(value, separators=(",", ":"))
+    if len(text) > VALUE_LIMIT:
+        text = text[: VALUE_LIMIT - 3] + "..."
+    return text
+
+
+def format_services(services: list[dict]) -> str:
+    """Format services as a list of names and templates."""
+    return "\n".join(
+        f"- {service['name']} ({template_of(service)})" for service in services
+    )
+
+
+def format_diff(diff: dict, left_name: str, right_name: str) -> str:
+    """Format a diff as compact text."""
+    lines = []
+    if diff["only_left"]:
+        lines.append(f"only in {left_name}:")
+        lines.append(format_services(diff["only_left"]))
+    if diff["only_right"]:
+        lines.append(f"only in {right_name}:")
+        lines.append(format_services(diff["only_right"]))
+    if diff["changed"]:
+        lines.append(f"changed ({left_name} -> {right_name}):")
+        for change in diff["changed"]:
+            lines.append(f"- {change['name']}:")
+            if "template" in change:
+                left, right = change["template"]
+                lines.append(f"  template: {left} -> {right}")
+            for path, left, right in change.get("attributes", []):
+                lines.append(
+                    f"  {path}: {format_value(left)} -> {format_value(right)}"
+                )
+    lines.append(f"identical services: {diff['identical']}")
+    return "\n".join(lines)
+
+
+def diff_environments(
+    walrus_client: WalrusClient,
+    project_id: str,
+    left_environment: str,
+    right_environment: str,
+) -> str:
+    """Diff services of two environments, listed concurrently."""
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        left_future = executor.submit(
+            walrus_client.list_services, project_id, left_environment
+        )
+        right_future = executor.submit(
+            walrus_client.list_services, project_id, right_environment
+        )
+        left = left_future.result()
+        right = right_future.result()
+
+    return format_diff(
+        diff_services(left, right), left_environment, right_environment
+    )
@@ -0,0 +1,234 @@
+"""Normalize and render dependency graphs of environments."""
+import hashlib
+import json
+import os
+from xml.sax.saxutils import escape, quoteattr
+
+OUTPUT_DIRECTORY = "/tmp/appilot/graphs"
+FORMATS = ("image", "svg", "dot", "text")
+
+NODE_SHAPES = {
+    "Service": "box",
+    "ServiceResourceGroup": "ellipse",
+    "ServiceResource": "ellipse",
+}
+EDGE_STYLES = {
+    "Composition": "composition",
+    "Realization": "dotted",
+    "Dependency": "dashed",
+}
+SVG_DASHES = {
+    "dotted": "2,3",
+    "dashed": "6,4",
+}
+
+NODE_WIDTH = 160
+NODE_HEIGHT = 48
+LAYER_GAP = 90
+NODE_GAP = 30
+
+
+class Graph:
+    """Graph with unique vertices and unique edges between them."""
+
+    def __init__(self, graph_data: dict):
+        self.vertices = {}
+        for vertex in graph_data.get("vertices") or []:
+            if vertex["id"] in self.vertices:
+                continue
+            if vertex["kind"] == "Service":
+                kind = "service"
+            else:
+                kind = (vertex.get("extensions") or {}).get("type", "")
+            self.vertices[vertex["id"]] = {
+                "id": vertex["id"],
+                "name": vertex["name"],
+                "kind": vertex["kind"],
+                "type": kind,
+            }
+
+        # The API may return duplicate edges and edges to vertices not in
+        # the graph.
+        seen = set()
+        self.edges = []
+        for edge in graph_data.get("edges") or []:
+            start = (edge.get("start") or {}).get("id")
+            end = (edge.get("end") or {}).get("id")
+            if start not in self.vertices or end not in self.vertices:
+                continue
+            if (start, end) in seen:
+                continue
+            seen.add((start, end))
+            self.edges.append((start, end, edge.get("type")))
+
+    def digest(self) -> str:
+        data = json.dumps(
+            [
+                sorted(self.vertices.values(), key=lambda v: v["id"]),
+                sorted(self.edges, key=lambda e: (e[0], e[1])),
+            ],
+            sort_keys=True,
+        )
+        return hashlib.sha256(data.encode("utf-8")).hexdigest()
+
+    def label(self, vertex_id: str) -> str:
+        vertex = self.vertices[vertex_id]
+        return f"{vertex['name']} ({vertex['type']})"
+
+    def layers(self) -> list[list[str]]:
+        """Assign each vertex to the layer after its deepest parent. Vertices
+        in cycles go to the last layer."""
+        parents = {id: [] for id in self.vertices}
+        children = {id: [] for id in self.vertices}
+        for start, end, _ in self.edges:
+            parents[end].append(start)
+            children[start].append(end)
+
+        depth = {}
+        pending = {id: len(parents[id]) for id in self.vertices}
+        queue = [id for id, count in pending.items() if count == 0]
+        for id in queue:
+            depth[id] = max((depth[p] + 1 for p in parents[id]), default=0)
+            for child in children[id]:
+                pending[child] -= 1
+                if pending[child] == 0:
+                    queue.append(child)
+
+        last = max(depth.values(), default=-1) + 1
+        layers = [[] for _ in range(last + 1)]
+        for id in self.vertices:
+            layers[depth.get(id, last)].append(id)
+        return [layer for layer in layers if layer]
+
+
+def to_text(graph: Graph) -> str:
+    lines = []
+    children = {id: [] for id in graph.vertices}
+    for start, end, edge_type in graph.edges:
+        children[start].append((end, edge_type))
+    for id in graph.vertices:
+        lines.append(graph.label(id))
+        for end, edge_type in children[id]:
+            lines.append(f"  -> {graph.label(end)} [{edge_type}]")
+    return "\n".join(lines)
+
+
+def to_dot(graph: Graph) -> str:
+    lines = ["digraph G {"]
+    for id, vertex in graph.vertices.items():
+        label = f"<{escape(vertex['name'])}<br/>{escape(vertex['type'])}>"
+        shape = NODE_SHAPES.get(vertex["kind"], "ellipse")
+        lines.append(f"{json.dumps(id)} [label={label}, shape={shape}];")
+    for start, end, edge_type in graph.edges:
+        style = EDGE_STYLES.get(edge_type, "solid")
+        lines.append(
+            f"{json.dumps(start)} -> {json.dumps(end)} [style={style}];"
+        )
+    lines.append("}")
+    return "\n".join(lines)
+
+
+def to_svg(graph: Graph) -> str:
+    """Draw the graph top down by layers, without Graphviz."""
+    layers = graph.layers()
+    columns = max((len(layer) for layer in layers), default=0)
+    width = max(columns * (NODE_WIDTH + NODE_GAP) + NODE_GAP, 1)
+    height = max(len(layers) * (NODE_HEIGHT + LAYER_GAP) + NODE_GAP, 1)
+
+    positions = {}
+    for row, layer in enumerate(layers):
+        offset = (width - len(layer) * (NODE_WIDTH + NODE_GAP)) / 2
+        for column, id in enumerate(layer):
+            x = offset + column * (NODE_WIDTH + NODE_GAP) + NODE_GAP / 2
+            y = NODE_GAP + row * (NODE_HEIGHT + LAYER_GAP)
+            positions[id] = (x, y)
+
+    elements = [
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{width:.0f}" '
+        f'height="{height:.0f}" font-family="sans-serif" font-size="12">',
+        '<defs><marker id="arrow" viewBox="0 0 10 10" refX="10" refY="5" '
+        'markerWidth="8" markerHeight="8" orient="auto">'
+        '<path d="M0,0 L10,5 L0,10 z"/></marker></defs>',
+    ]
+    for start, end, edge_type in graph.edges:
+        x1, y1 = positions[start]
+        x2, y2 = positions[end]
+        dash = SVG_DASHES.get(EDGE_STYLES.get(edge_type, ""))
+        elements.append(
+            f'<line x1="{x1 + NODE_WIDTH / 2:.0f}" '
+            f'y1="{y1 + NODE_HEIGHT:.0f}" x2="{x2 + NODE_WIDTH / 2:.0f}" '
+            f'y2="{y2:.0f}" stroke="black" marker-end="url(#arrow)"'
+            + (f' stroke-dasharray="{dash}"' if dash else "")
+            + "/>"
+        )
+    for id, vertex in graph.vertices.items():
+        x, y = positions[id]
+        if vertex["kind"] == "Service":
+            shape = (
+                f'<rect x="{x:.0f}" y="{y:.0f}" width="{NODE_WIDTH}" '
+                f'height="{NODE_HEIGHT}" fill="white" stroke="black"/>'
+            )
+        else:
+            shape = (
+                f'<ellipse cx="{x + NODE_WIDTH / 2:.0f}" '
+                f'cy="{y + NODE_HEIGHT / 2:.0f}" rx="{NODE_WIDTH / 2}" '
+                f'ry="{NODE_HEIGHT / 2}" fill="white" stroke="black"/>'
+            )
+        center = x + NODE_WIDTH / 2
+        elements.append(
+            f"<g><title>{escape(id)}</title>{shape}"
+            f'<text x="{center:.0f}" y="{y + 20:.0f}" text-anchor="middle">'
+            f"{escape(vertex['name'])}</text>"
+            f'<text x="{center:.0f}" y="{y + 36:.0f}" text-anchor="middle" '
+            f"fill={quoteattr('#555')}>{escape(vertex['type'])}</text></g>"
+        )
+    elements.append("</svg>")
+    return "\n".join(elements)
+
+
+def write_png(graph: Graph, path: str):
+    """Render with Graphviz through pydot."""
+    import pydot
+
+    graph_dot = pydot.Dot(graph_type="digraph")
+    for id, vertex in graph.vertices.items():
+        graph_dot.add_node(
+            pydot.Node(
+                name=id,
+                label=f"<{vertex['name']}<br/>{vertex['type']}>",
+                shape=NODE_SHAPES.get(vertex["kind"], "ellipse"),
+                height=1,
+            )
+        )
+    for start, end, edge_type in graph.edges:
+        graph_dot.add_edge(
+            pydot.Edge(start, end, style=EDGE_STYLES.get(edge_type, "solid"))
+        )
+    graph_dot.write_png(path)
+
+
+def render(graph_data: dict, format: str = "image") -> str:
+    """Render a graph in the format. Text and DOT are returned as strings.
+    SVG and images are written to files named by the digest of the graph,
+    so an unchanged graph is not rendered again. Returns the file path."""
+    graph = Graph(graph_data)
+    if format == "text":
+        return to_text(graph)
+    if format == "dot":
+        return to_dot(graph)
+
+    extension = "png" if format == "image" else "svg"
+    os.makedirs(OUTPUT_DIRECTORY, exist_ok=True)
+    path = os.path.join(OUTPUT_DIRECTORY, f"{graph.digest()}.{extension}")
+    if os.path.exists(path):
+        return path
+
+    # Write to a temporary file first so no partial output gets cached.
+    temporary_path = f"{path}.{os.getpid()}.tmp"
+    if extension == "png":
+        write_png(graph, temporary_path)
+    else:
+        with open(temporary_path, "w") as f:
+            f.write(to_svg(graph))
+    os.replace(temporary_path, path)
+    return path
@@ -0,0 +1,72 @@
+"""Project existing services to the fields service construction needs."""
+import json
+import time
+
+from utils import utils
+from walrus.cache import CacheEntry
+from walrus.client import WalrusClient
+
+# Max tokens of the existing services in a prompt.
+SERVICES_TOKEN_BUDGET = 1500
+# Seconds a projection is reused. Service changes invalidate it earlier.
+PROJECTION_TTL = 60
+
+
+def project_service(service: dict) -> dict:
+    """Keep the name, template and the referable keys of a service."""
+    template = service.get("template") or {}
+    projected = {
+        "name": service.get("name"),
+        "template": f"{template.get('name', '')}@{template.get('version', '')}",
+        "attributes": sorted((service.get("attributes") or {}).keys()),
+    }
+    outputs = service.get("outputs")
+    if outputs:
+        if isinstance(outputs, dict):
+            projected["outputs"] = sorted(outputs.keys())
+        else:
+            projected["outputs"] = [output.get("name") for output in outputs]
+    return projected
+
+
+def project_services(
+    services: list[dict], token_budget: int = SERVICES_TOKEN_BUDGET
+) -> str:
+    """Project services into one JSON line each, up to the token budget."""
+    if len(services) == 0:
+        return "None"
+
+    lines = []
+    used = 0
+    for service in services:
+        line = json.dumps(project_service(service), separators=(",", ":"))
+        used += utils.count_tokens(line)
+        if used > token_budget:
+            lines.append(
+                f"({len(services) - len(lines)} more services omitted)"
+            )
+            break
+        lines.append(line)
+    return "\n".join(lines)
+
+
+def existing_services_context(
+    walrus_client: WalrusClient, project_id: str, environment_id: str
+) -> str:
+    """Get projected services of an environment. The projection is cached in
+    the client's response cache, which service changes invalidate."""
+    key = walrus_client.cache_key(
+        f"/v1/projects/{project_id}/environments/{environment_id}"
+        "/services#projection"
+    )
+    entry = walrus_client.cache.get(key)
+    if entry is not None and entry.is_fresh():
+        return entry.body
+
+    services = walrus_client.list_services(project_id, environment_id)
+    projection = project_services(services)
+    walrus_client.cache.put(
+        key,
+        CacheEntry(body=projection, expires_at=time.time() + PROJECTION_TTL),
+    )
+    return projection
@@ -0,0 +1,170 @@
+"""Inform users when services become ready, over one watch stream per
+environment."""
+import logging
+import threading
+import time
+from typing import Callable, Dict, Tuple
+
+from i18n import text
+from walrus.client import WalrusClient
+from walrus.stream import ServiceStateTable
+
+logger = logging.getLogger(__name__)
+
+# Seconds to wait for a service to become ready.
+READY_TIMEOUT = 600
+# Seconds without events before the watch stream is reconnected. It bounds
+# how late an expired wait is noticed.
+WATCH_READ_TIMEOUT = 30
+
+
+class ServiceReadinessWatcher:
+    """Track services waiting for readiness in an environment. A single
+    background thread consumes the environment's service watch stream and
+    notifies for every waiting service: when it becomes ready, when the
+    wait times out, or when watching fails."""
+
+    def __init__(
+        self,
+        walrus_client: WalrusClient,
+        project_id: str,
+        environment_id: str,
+        notify: Callable[[str], None],
+    ):
+        self.walrus_client = walrus_client
+        self.project_id = project_id
+        self.environment_id = environment_id
+        self.notify = notify
+        # Service name or id to its deadline and timeout.
+        self._waiting: Dict[str, Tuple[float, float]] = {}
+        # Current services, kept by the watch thread.
+        self._table = ServiceStateTable()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def watch(self, service: str, timeout: float = READY_TIMEOUT):
+        """Wait for a service given its name or id. A service already ready
+        is notified at once, as no event will come for it."""
+        with self._lock:
+            ready = None
+            if self._thread is not None and self._thread.is_alive():
+                ready = self._ready_service(service)
+            if ready is None:
+                self._waiting[service] = (time.time() + timeout, timeout)
+                if self._thread is None or not self._thread.is_alive():
+                    self._thread = threading.Thread(
+                        target=self._run, daemon=True
+                    )
+                    self._thread.start()
+        if ready is not None:
+            self._notify_ready(ready.get("name"))
+
+    def _ready_service(self, service: str):
+        """Find a ready service by name or id in the table. Call with the
+        lock held."""
+        for item in self._table.services.values():
+            if service not in (item.get("name"), item.get("id")):
+                continue
+            status = (item.get("status") or {}).get("summaryStatus")
+            if status == "Ready":
+                return item
+        return None
+
+    def cancel(self, service: str):
+        with self._lock:
+            self._waiting.pop(service, None)
+
+    def waiting(self) -> list[str]:
+        with self._lock:
+            return list(self._waiting.keys())
+
+    def _run(self):
+        with self._lock:
+            self._table = ServiceStateTable()
+        events = self.walrus_client.stream_service_events(
+            self.project_id,
+            self.environment_id,
+            read_timeout=WATCH_READ_TIMEOUT,
+        )
+        try:
+            for event in events:
+                with self._lock:
+                    if event.get("type") == "reset":
+                        changes = self._table.reset(event["items"])
+                    else:
+                        changes = self._table.apply(event)
+                self._check(changes)
+                if not self._expire():
+                    break
+        except Exception as e:
+            logger.debug(f"Failed to watch service readiness: {e}")
+            with self._lock:
+                services = list(self._waiting.keys())
+                self._waiting.clear()
+            for service in services:
+                self.notify(
+                    text.get("service_watch_failed_message").format(service, e)
+                )
+        finally:
+            events.close()
+
+    def _notify_ready(self, service: str):
+        self.notify(text.get("service_ready_message").format(service))
+
+    def _check(self, changes):
+        for event_type, service in changes:
+            if event_type == "delete":
+                continue
+            status = (service.get("status") or {}).get("summaryStatus")
+            if status != "Ready":
+                continue
+            with self._lock:
+                waited = [
+                    self._waiting.pop(key, None)
+                    for key in (service.get("name"), service.get("id"))
+                ]
+            if any(wait is not None for wait in waited):
+                self._notify_ready(service.get("name"))
+
+    def _expire(self) -> bool:
+        """Drop expired waits and notify them. Returns whether any service
+        is still waiting."""
+        now = time.time()
+        expired = []
+        with self._lock:
+            for service, (deadline, timeout) in list(self._waiting.items()):
+                if deadline < now:
+                    del self._waiting[service]
+                    expired.append((service, timeout))
+            waiting = len(self._waiting) > 0
+            if not waiting:
+                # Cleared under the lock so a new watch starts a new thread.
+                self._thread = None
+        for service, timeout in expired:
+            self.notify(
+                text.get("service_not_ready_message").format(
+                    service, round(timeout / 60)
+                )
+            )
+        return waiting
+
+
+_watchers: Dict[Tuple[str, str], ServiceReadinessWatcher] = {}
+_watchers_lock = threading.Lock()
+
+
+def get_watcher(
+    walrus_client: WalrusClient,
+    project_id: str,
+    environment_id: str,
+    notify: Callable[[str], None],
+) -> ServiceReadinessWatcher:
+    """Get the shared readiness watcher of an environment. Notify gets the
+    messages to show."""
+    with _watchers_lock:
+        key = (project_id, environment_id)
+        if key not in _watchers:
+            _watchers[key] = ServiceReadinessWatcher(
+                walrus_client, project_id, environment_id, notify
+            )
+        return _watchers[key]
@@ -0,0 +1,150 @@
+"""Compact template schemas to put in prompts."""
+import json
+from typing import Optional
+
+from utils import utils
+from utils.search import tokenize
+
+# Max tokens of a compacted template version in a prompt.
+TEMPLATE_TOKEN_BUDGET = 1500
+# Max characters of a variable description.
+DESCRIPTION_LIMIT = 160
+
+
+def schema_variables(template_version: dict) -> list[dict]:
+    """Get variables of a template version in a uniform shape. Supports both
+    the variable list schema and the OpenAPI schema of Walrus templates."""
+    schema = template_version.get("schema") or {}
+    if "variables" in schema:
+        return [
+            {
+                "name": variable.get("name", ""),
+                "type": variable.get("type", ""),
+                "default": variable.get("default"),
+                "required": variable.get("required", False),
+                "sensitive": variable.get("sensitive", False),
+                "options": variable.get("options"),
+                "description": variable.get("description", ""),
+            }
+            for variable in schema.get("variables") or []
+        ]
+
+    variables_schema = (
+        (schema.get("openAPISchema") or {})
+        .get("components", {})
+        .get("schemas", {})
+        .get("variables", {})
+    )
+    required = set(variables_schema.get("required") or [])
+    return [
+        {
+            "name": name,
+            "type": openapi_type(property),
+            "default": property.get("default"),
+            "required": name in required,
+            "sensitive": property.get("writeOnly", False)
+            or property.get("format") == "password",
+            "options": property.get("enum"),
+            "description": property.get("description", ""),
+        }
+        for name, property in (
+            variables_schema.get("properties") or {}
+        ).items()
+    ]
+
+
+def openapi_type(property: dict) -> str:
+    property_type = property.get("type", "")
+    if property_type == "array":
+        return f"list({openapi_type(property.get('items') or {})})"
+    if property_type == "object" and "additionalProperties" in property:
+        additional = property["additionalProperties"]
+        if isinstance(additional, dict):
+            return f"map({openapi_type(additional)})"
+    return property_type
+
+
+def format_variable(variable: dict) -> str:
+    """Format a variable as "name:type=default (required) — description"."""
+    line = variable["name"]
+    if variable["type"]:
+        line += f":{variable['type']}"
+    if variable["default"] not in (None, "", [], {}):
+        line += "=" + json.dumps(variable["default"], separators=(",", ":"))
+    flags = []
+    if variable["required"]:
+        flags.append("required")
+    if variable["sensitive"]:
+        flags.append("sensitive")
+    if variable["options"]:
+        flags.append("one of " + "|".join(str(o) for o in variable["options"]))
+    if flags:
+        line += f" ({', '.join(flags)})"
+
+    description = " ".join((variable["description"] or "").split())
+    if len(description) > DESCRIPTION_LIMIT:
+        description = description[: DESCRIPTION_LIMIT - 3] + "..."
+    if description:
+        line += f" — {description}"
+    return line
+
+
+def compact_template_version(
+    template_version: dict,
+    query: Optional[str] = "",
+    token_budget: int = TEMPLATE_TOKEN_BUDGET,
+) -> str:
+    """Flatten a template version into a dense variable list. UI metadata is
+    dropped. Over the token budget, optional variables unrelated to the
+    query are dropped as well."""
+    template = template_version.get("template") or {}
+    header = [
+        f"template: {template.get('name') or template_version.get('name', '')}",
+        f"version: {template_version.get('version', '')}",
+        "variables:",
+    ]
+    lines = [
+        (variable, "- " + format_variable(variable))
+        for variable in schema_variables(template_version)
+    ]
+
+    used = utils.count_tokens("\n".join(header))
+    if (
+        used + sum(utils.count_tokens(line) for _, line in lines)
+        <= token_budget
+    ):
+        return "\n".join(header + [line for _, line in lines])
+
+    # Keep required variables first, then the ones most related to the query.
+    query_tokens = set(tokenize(query or ""))
+
+    def relevance(variable: dict) -> int:
+        tokens = set(
+            tokenize(f"{variable['name']} {variable['description'] or ''}")
+        )
+        return len(tokens & query_tokens)
+
+    ranked = sorted(
+        range(len(lines)),
+        key=lambda i: (
+            not lines[i][0]["required"],
+            -relevance(lines[i][0]),
+            i,
+        ),
+    )
+    kept = set()
+    for i in ranked:
+        variable, line = lines[i]
+        tokens = utils.count_tokens(line)
+        if used + tokens > token_budget and not variable["required"]:
+            continue
+        kept.add(i)
+        used += tokens
+
+    compacted = header + [
+        line for i, (_, line) in enumerate(lines) if i in kept
+    ]
+    omitted = len(lines) - len(kept)
+    if omitted > 0:
+        compacted.append(f"({omitted} optional variables omitted)")
+    return "\n".join(compacted)
@@ -0,0 +1,131 @@
+"""Incremental JSON decoding of streamed Walrus API responses."""
+import codecs
+import json
+import re
+from typing import Any, Dict, Iterable, List, Tuple
+
+
+def first_array_item(chunks: Iterable[bytes], key: str = "items") -> Any:
+    """Decode the first item of an array field from a streamed JSON document.
+    Stops reading as soon as the item is complete. Returns None if the array is
+    empty or missing."""
+    decoder = json.JSONDecoder()
+    utf8_decoder = codecs.getincrementaldecoder("utf-8")()
+    field = re.compile(r'"%s"\s*:\s*\[' % re.escape(key))
+    buffer = ""
+    start = -1
+    for chunk in chunks:
+        buffer += utf8_decoder.decode(chunk)
+        if start < 0:
+            match = field.search(buffer)
+            if match is None:
+                continue
+            start = match.end()
+
+        while start < len(buffer) and buffer[start].isspace():
+            start += 1
+        if start == len(buffer):
+            continue
+        if buffer[start] == "]":
+            return None
+
+        try:
+            item, _ = decoder.raw_decode(buffer, start)
+        except json.JSONDecodeError:
+            # The item is not complete yet.
+            continue
+        return item
+
+    return None
+
+
+class EventTooLargeError(Exception):
+    """A watch event exceeds the max event size."""
+
+
+class EventDecoder:
+    """Decode JSON events from a byte stream regardless of how the stream is
+    chunked. Bytes between events, like newlines, are skipped."""
+
+    def __init__(self, max_event_size: int = 16 * 1024 * 1024):
+        self.max_event_size = max_event_size
+        self._decoder = json.JSONDecoder()
+        self._utf8_decoder = codecs.getincrementaldecoder("utf-8")()
+        self._buffer = ""
+
+    def feed(self, chunk: bytes) -> List[Any]:
+        """Feed bytes and return the events completed by them."""
+        text = self._utf8_decoder.decode(chunk)
+        self._buffer += text
+        if "}" not in text:
+            # An event can not be completed without a closing brace.
+            self._check_size()
+            return []
+
+        events = []
+        position = 0
+        while True:
+            position = self._buffer.find("{", position)
+            if position < 0:
+                position = len(self._buffer)
+                break
+            try:
+                event, end = self._decoder.raw_decode(self._buffer, position)
+            except json.JSONDecodeError:
+                break
+            events.append(event)
+            position = end
+
+        self._buffer = self._buffer[position:]
+        self._check_size()
+        return events
+
+    def _check_size(self):
+        if len(self._buffer) > self.max_event_size:
+            self._buffer = ""
+            raise EventTooLargeError("Watch event exceeds the max event size")
+
+
+class ServiceStateTable:
+    """Services keyed by id, kept up to date by applying watch events."""
+
+    def __init__(self):
+        self.services: Dict[str, dict] = {}
+
+    def reset(self, services: List[dict]) -> List[Tuple[str, dict]]:
+        """Replace the table with a full listing. Returns the services that
+        changed since the previous state."""
+        previous = self.services
+        self.services = {service["id"]: service for service in services}
+        changes = []
+        for id, service in self.services.items():
+            if id not in previous:
+                changes.append(("create", service))
+            elif previous[id] != service:
+                changes.append(("update", service))
+        for id, service in previous.items():
+            if id not in self.services:
+                changes.append(("delete", service))
+        return changes
+
+    def apply(self, event: dict) -> List[Tuple[str, dict]]:
+        """Apply a create, update or delete event. Returns the changed
+        services with the event type."""
+        event_type = event.get("type", "update")
+        items = event.get("items") or []
+        changes = []
+        if event_type == "delete":
+            ids = list(event.get("ids") or [])
+            ids.extend(item["id"] for item in items if "id" in item)
+            for id in ids:
+                service = self.services.pop(id, None)
+                if service is not None:
+                    changes.append((event_type, service))
+            return changes
+
+        for item in items:
+            if "id" not in item:
+                continue
+            self.services[item["id"]] = item
+            changes.append((event_type, item))
+        return changes
@@ -1,4 +1,5 @@
 import urllib3
+from agent.fast_path import Intent
 from walrus import context
 from walrus.tools.general.tools import BrowseURLTool
 from walrus.tools.manage_context.tool import (
@@ -8,6 +9,7 @@ from walrus.tools.manage_context.tool import (
 from walrus.tools.manage_environment.tool import (
     CloneEnvironmentTool,
     DeleteEnvironmentsTool,
+    DiffEnvironmentsTool,
     GetEnvironmentDependencyGraphTool,
     ListEnvironmentsTool,
 )
@@ -17,6 +19,7 @@ from walrus.tools.manage_service.tool import (
     ConstructServiceToUpdateTool,
     CreateServiceTool,
     DeleteServicesTool,
+    DiagnoseServiceTool,
     GetServiceAccessEndpointsTool,
     GetServiceDependencyGraphTool,
     GetServiceResourceLogsReturnDirectTool,
@@ -33,6 +36,7 @@ from walrus.tools.manage_template.tool import (
     GetTemplateSchemaTool,
     MatchTemplateTool,
 )
+from walrus.cache import ResponseCache
 from walrus.client import WalrusClient
 from langchain.schema.language_model import BaseLanguageModel
 from utils import utils
@@ -58,6 +62,7 @@ class WalrusToolKit:
         walrus_skip_tls_verify = utils.get_env_bool(
             "WALRUS_SKIP_TLS_VERIFY", False
         )
+        walrus_cache_dir = utils.get_env("WALRUS_CACHE_DIR")
         if walrus_skip_tls_verify:
             urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 
@@ -69,11 +74,11 @@ class WalrusToolKit:
         self.walrus_client = WalrusClient(
             walrus_url,
             walrus_api_key,
+            cache=ResponseCache(cache_dir=walrus_cache_dir),
             verify=(not walrus_skip_tls_verify),
         )
         context.set_default(
-            walrus_url=walrus_url,
-            walrus_api_key=walrus_api_key,
+            self.walrus_client,
             default_project=walrus_default_project,
             default_environment=walrus_default_environment,
         )
@@ -88,6 +93,7 @@ class WalrusToolKit:
             ListEnvironmentsTool(walrus_client=walrus_client),
             DeleteEnvironmentsTool(walrus_client=walrus_client),
             CloneEnvironmentTool(walrus_client=walrus_client),
+            DiffEnvironmentsTool(walrus_client=walrus_client),
             GetEnvironmentDependencyGraphTool(
                 walrus_client=walrus_client, return_direct=True
             ),
@@ -106,6 +112,7 @@ class WalrusToolKit:
             UpdateServiceTool(walrus_client=walrus_client),
             DeleteServicesTool(walrus_client=walrus_client),
             ListServiceResourcesTool(walrus_client=walrus_client),
+            DiagnoseServiceTool(walrus_client=walrus_client),
             GetServiceResourceLogsTool(walrus_client=walrus_client),
             GetServiceResourceLogsReturnDirectTool(
                 walrus_client=walrus_client, return_direct=True
@@ -115,3 +122,14 @@ class WalrusToolKit:
             GetServiceDependencyGraphTool(walrus_client=walrus_client),
         ]
         return tools
+
+    def get_intents(self):
+        # The list tools take an empty input for the current context.
+        return [
+            Intent(
+                rf"(?:list|show|get)(?: me)?(?: all)?(?: the)? {kind}",
+                f"list_{kind}",
+                lambda match: "",
+            )
+            for kind in ("projects", "environments", "services")
+        ]
@@ -1,9 +1,60 @@
-from typing import Any
+import base64
+import json
+from typing import Any, Callable, Iterator
 from langchain.agents.tools import BaseTool
 from walrus.client import WalrusClient
 
+# Max number of items a list tool returns at once.
+LIST_LIMIT = 50
+
 
 class WalrusTool(BaseTool):
     """Tool to interacte with Walrus APIs."""
 
     walrus_client: WalrusClient
+
+
+def encode_continue_token(offset: int, **scope: Any) -> str:
+    data = json.dumps({"offset": offset, **scope})
+    return base64.urlsafe_b64encode(data.encode("utf-8")).decode("utf-8")
+
+
+def decode_continue_token(token: str) -> dict:
+    """Decode a continuation token. Returns an empty dict if invalid."""
+    try:
+        data = json.loads(base64.urlsafe_b64decode(token.strip()))
+    except Exception:
+        return {}
+    if not isinstance(data, dict) or not isinstance(data.get("offset"), int):
+        return {}
+    return data
+
+
+def truncated_list(
+    iterate: Callable[..., Iterator[dict]],
+    offset: int = 0,
+    limit: int = LIST_LIMIT,
+    **scope: Any,
+):
+    """List at most limit items from offset. When there are more, return a
+    truncated result with a count and a continuation token. The count is the
+    total from the pagination of the API. When the API gives no total, the
+    number of items returned is given as "returned" instead. The token
+    carries the scope, so the listing continues in it after the context
+    changes."""
+    pagination = {}
+    items = list(
+        iterate(limit=limit + 1, offset=offset, pagination=pagination)
+    )
+    if len(items) <= limit:
+        return items
+
+    result = {"items": items[:limit]}
+    total = pagination.get("total")
+    if isinstance(total, int):
+        result["count"] = total
+    else:
+        result["returned"] = limit
+    result["truncated"] = True
+    result["continue"] = encode_continue_token(offset + limit, **scope)
+    return result
@@ -35,8 +35,8 @@ class ChangeContextTool(BaseTool):
         project_id = walrus_context.GLOBAL_CONTEXT.project_id
         if "project_name" in context and context["project_name"] != "":
             try:
-                project = self.walrus_client.get_project(
-                    context["project_name"]
+                project = walrus_context.resolve_project(
+                    self.walrus_client, context["project_name"]
                 )
             except Exception as e:
                 return e
@@ -45,11 +45,11 @@ class ChangeContextTool(BaseTool):
 
         if "environment_name" in context and context["environment_name"] != "":
             try:
-                environment = self.walrus_client.get_environment(
-                    project_id, context["environment_name"]
+                environment = walrus_context.resolve_environment(
+                    self.walrus_client, project_id, context["environment_name"]
                 )
             except Exception as e:
                 return e
             context["environment_id"] = environment["id"]
 
-        walrus_context.update_context(context)
+        walrus_context.update_context(context, self.walrus_client.api_url)
@@ -1,12 +1,12 @@
 import json
-import os
 from langchain.agents.tools import BaseTool
 from i18n import text
 from tools.base.tools import RequireApprovalTool
-import pydot
 from PIL import Image
 
+from walrus import diff, graph
 from walrus.client import WalrusClient
+from walrus.tools.base.tools import decode_continue_token, truncated_list
 from walrus import context as walrus_context
 
 
@@ -17,14 +17,26 @@ class ListEnvironmentsTool(BaseTool):
     description = (
         "List environments of a project."
         "Input should be a project id or an empty string indicating current project in the context."
+        "To list more after a truncated output, input should be its continuation token."
     )
     walrus_client: WalrusClient
 
     def _run(self, project_id: str) -> str:
+        offset = 0
+        token = decode_continue_token(project_id)
+        if "project_id" in token:
+            project_id = token["project_id"]
+            offset = token["offset"]
         if project_id == "":
             project_id = walrus_context.GLOBAL_CONTEXT.project_id
         try:
-            environments = self.walrus_client.list_environments(project_id)
+            environments = truncated_list(
+                lambda **kwargs: self.walrus_client.iter_environments(
+                    project_id, **kwargs
+                ),
+                offset=offset,
+                project_id=project_id,
+            )
         except Exception as e:
             return e
         if environments is not None and len(environments) > 0:
@@ -51,6 +63,8 @@ class DeleteEnvironmentsTool(RequireApprovalTool):
             self.walrus_client.delete_environments(project_id, ids)
         except Exception as e:
             return e
+        finally:
+            walrus_context.invalidate_environments(project_id)
 
         return "Deletion started."
 
@@ -59,81 +73,47 @@ class GetEnvironmentDependencyGraphTool(BaseTool):
     """Tool to get environment dependency graph."""
 
     name = "get_environment_dependency_graph"
-    description = "Get dependency graph of an environment. Input should be name or id of an environment."
+    description = (
+        "Get dependency graph of an environment. "
+        "Input should be name or id of an environment, "
+        'or a json string with 2 keys: "environment" and "format". '
+        '"format" is one of "image", "svg", "dot" and "text", defaults to "image". '
+        'Use "text" or "dot" when users want the graph as text.'
+    )
     walrus_client: WalrusClient
 
-    def show_graph(self, graph_data: dict):
-        node_shape_map = {
-            "Service": "box",
-            "ServiceResourceGroup": "ellipse",
-            "ServiceResource": "ellipse",
-        }
-        edge_style_map = {
-            "Composition": "composition",
-            "Realization": "dotted",
-            "Dependency": "dashed",
-        }
-
-        node_height = 1
-        graph = pydot.Dot(graph_type="digraph")
-        node_ids = []
-        for vertex in graph_data["vertices"]:
-            label_suffix = ""
-            if vertex["kind"] == "Service":
-                label_suffix = "<br/>service"
-            else:
-                label_suffix = f"<br/>{vertex['extensions']['type']}"
-
-            graph.add_node(
-                pydot.Node(
-                    name=vertex["id"],
-                    label=f"<{vertex['name']}{label_suffix}>",
-                    shape=node_shape_map[vertex["kind"]],
-                    height=node_height,
-                )
-            )
-            node_ids.append(vertex["id"])
-
-        edge_ids = []
-        for edge in graph_data["edges"]:
-            # FIXME: This is a hack to avoid edges that are not in the graph. resolve in API.
-            if (
-                edge.get("start").get("id") not in node_ids
-                or edge.get("end").get("id") not in node_ids
-            ):
-                continue
-            # FIXME: This is a hack to avoid duplicate edges. resolve in API.
-            edge_id = edge.get("start").get("id") + edge.get("end").get("id")
-            if edge_id in edge_ids:
-                continue
-
-            graph.add_edge(
-                pydot.Edge(
-                    edge.get("start").get("id"),
-                    edge.get("end").get("id"),
-                    style=edge_style_map[edge.get("type")],
-                )
-            )
-            edge_ids.append(edge_id)
-
-        output_directory = "/tmp/appilot"
-        if not os.path.exists(output_directory):
-            os.makedirs(output_directory)
-        image_path = os.path.join(output_directory, "dependency_graph.png")
-        graph.write_png(image_path)
-        image = Image.open(image_path)
-        image.show()
+    def _run(self, query: str) -> str:
+        environment = query
+        format = "image"
+        try:
+            data = json.loads(query)
+            if isinstance(data, dict):
+                environment = data.get("environment", "")
+                format = data.get("format") or format
+        except json.JSONDecodeError:
+            pass
+        if format not in graph.FORMATS:
+            return f"Unsupported format {format}."
 
-    def _run(self, environment: str) -> str:
         project_id = walrus_context.GLOBAL_CONTEXT.project_id
         if environment is None or environment == "":
             environment = walrus_context.GLOBAL_CONTEXT.environment_id
 
-        graph_data = self.walrus_client.get_environment_graph(
-            project_id, environment
-        )
-        self.show_graph(graph_data)
+        try:
+            graph_data = self.walrus_client.get_environment_graph(
+                project_id, environment
+            )
+            output = graph.render(graph_data, format)
+        except Exception as e:
+            return e
+
+        if format in ("text", "dot"):
+            return f"```\n{output}\n```"
+        if format == "svg":
+            return f"The dependency graph is saved to {output}."
 
+        image = Image.open(output)
+        image.show()
         return text.get("show_graph_message")
 
 
@@ -148,6 +128,15 @@ class CloneEnvironmentTool(RequireApprovalTool):
 
     walrus_client: WalrusClient
 
+    def preview(self, tool_input: str) -> str:
+        data = json.loads(tool_input)
+        services = self.walrus_client.list_services(
+            walrus_context.GLOBAL_CONTEXT.project_id,
+            data.get("original_environment_name"),
+        )
+        preview = diff.format_services(services)
+        return text.get("clone_environment_preview") + "\n" + preview
+
     def _run(self, text: str) -> str:
         try:
             data = json.loads(text)
@@ -171,5 +160,37 @@ class CloneEnvironmentTool(RequireApprovalTool):
             self.walrus_client.create_environment(project_id, environment)
         except Exception as e:
             return e
+        finally:
+            walrus_context.invalidate_environments(project_id)
+
+        cloned = diff.format_services(services)
+        return f"Successfully cloned. Services:\n{cloned}"
+
+
+class DiffEnvironmentsTool(BaseTool):
+    """Tool to compare services of two environments."""
+
+    name = "diff_environments"
+    description = (
+        "Compare services of two environments. Use when users ask what differs between environments."
+        'Input should be a json string with 2 keys: "environment_a" and "environment_b", names or ids of the environments.'
+        "Output is services only in one environment, and template, version and attribute changes of services in both."
+    )
+    walrus_client: WalrusClient
+
+    def _run(self, text: str) -> str:
+        try:
+            data = json.loads(text)
+        except Exception as e:
+            return e
 
-        return "Successfully cloned."
+        project_id = walrus_context.GLOBAL_CONTEXT.project_id
+        try:
+            return diff.diff_environments(
+                self.walrus_client,
+                project_id,
+                data.get("environment_a"),
+                data.get("environment_b"),
+            )
+        except Exception as e:
+            return e
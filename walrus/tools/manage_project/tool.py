@@ -1,18 +1,25 @@
 import json
 from langchain.agents.tools import BaseTool
 from walrus.client import WalrusClient
+from walrus.tools.base.tools import decode_continue_token, truncated_list
 
 
 class ListProjectsTool(BaseTool):
     """Tool to list projects."""
 
     name = "list_projects"
-    description = "List projects."
+    description = (
+        "List projects."
+        "Input should be an empty string, or the continuation token of a previous truncated output to list more."
+    )
     walrus_client: WalrusClient
 
     def _run(self, query: str) -> str:
+        offset = decode_continue_token(query).get("offset", 0)
         try:
-            projects = self.walrus_client.list_projects()
+            projects = truncated_list(
+                self.walrus_client.iter_projects, offset=offset
+            )
         except Exception as e:
             return e
         return json.dumps(projects)
@@ -1,8 +1,9 @@
 import json
-import threading
-import time
+import re
+from concurrent.futures import ThreadPoolExecutor
 
-from utils import utils
+import click
+from utils import logs, utils
 from i18n import text
 from walrus.client import WalrusClient
 from langchain.agents.tools import BaseTool
@@ -10,26 +11,48 @@ from langchain import LLMChain
 from langchain.prompts import PromptTemplate
 from langchain.schema.language_model import BaseLanguageModel
 from tools.base.tools import RequireApprovalTool
+from walrus.tools.base.tools import decode_continue_token, truncated_list
 from walrus import context as walrus_context
+from walrus import readiness
+from walrus.diagnosis import diagnose_service
+from walrus.projection import existing_services_context
+from walrus.schema import compact_template_version
 from walrus.tools.manage_service.prompt import (
     CONSTRUCT_SERVICE_TO_CREATE_PROMPT,
     CONSTRUCT_SERVICE_TO_UPDATE_PROMPT,
 )
 
+# Number of log lines scanned for errors when diagnosing.
+DIAGNOSE_LOG_SCAN_LINES = 2000
+
 
 class ListServicesTool(BaseTool):
     """Tool to list services."""
 
     name = "list_services"
-    description = "List services in current environment."
+    description = (
+        "List services in current environment."
+        "Input should be an empty string, or the continuation token of a previous truncated output to list more."
+    )
     walrus_client: WalrusClient
 
     def _run(self, query: str) -> str:
         project_id = walrus_context.GLOBAL_CONTEXT.project_id
         environment_id = walrus_context.GLOBAL_CONTEXT.environment_id
+        offset = 0
+        token = decode_continue_token(query)
+        if "environment_id" in token:
+            project_id = token["project_id"]
+            environment_id = token["environment_id"]
+            offset = token["offset"]
         try:
-            services = self.walrus_client.list_services(
-                project_id, environment_id
+            services = truncated_list(
+                lambda **kwargs: self.walrus_client.iter_services(
+                    project_id, environment_id, **kwargs
+                ),
+                offset=offset,
+                project_id=project_id,
+                environment_id=environment_id,
             )
         except Exception as e:
             return e
@@ -67,28 +90,16 @@ class InformServiceReadyTool(BaseTool):
     description = "Inform user when a service becomes ready. Input should be name or id of a service."
     walrus_client: WalrusClient
 
-    def watch_service_ready(self, input: str):
+    def _run(self, input: str) -> str:
         project_id = walrus_context.GLOBAL_CONTEXT.project_id
         environment_id = walrus_context.GLOBAL_CONTEXT.environment_id
-        start_time = time.time()
-        timeout = 600
-        while True:
-            time.sleep(3)
-            if time.time() - start_time > timeout:
-                break
-            service = self.walrus_client.get_service_by_name(
-                project_id, environment_id, input
-            )
-            if service.get("status").get("summaryStatus") == "Ready":
-                utils.print_ai_inform(
-                    text.get("service_ready_message").format(input)
-                )
-                break
-
-    def _run(self, input: str) -> str:
-        threading.Thread(
-            target=self.watch_service_ready, args=(input,)
-        ).start()
+        watcher = readiness.get_watcher(
+            self.walrus_client,
+            project_id,
+            environment_id,
+            notify=utils.print_ai_inform,
+        )
+        watcher.watch(input.strip())
         return text.get("inform_ready_start")
 
 
@@ -96,20 +107,24 @@ class ListServicesInAllEnvironmentsTool(BaseTool):
     """Tool to list services in all environments."""
 
     name = "list_services_in_all_environments"
-    description = "List services in all environments of current project."
+    description = (
+        "List services in all environments of current project."
+        'Output a json with 2 keys, "items" for services tagged with their environment, '
+        '"errors" for environments that failed to list.'
+    )
     walrus_client: WalrusClient
 
     def _run(self, query: str) -> str:
         project_id = walrus_context.GLOBAL_CONTEXT.project_id
         try:
-            services = self.walrus_client.list_services_in_all_environments(
+            result = self.walrus_client.list_services_in_all_environments(
                 project_id
             )
         except Exception as e:
             return e
 
-        if services is not None and len(services) > 0:
-            return json.dumps(services)
+        if len(result["items"]) > 0 or len(result["errors"]) > 0:
+            return json.dumps(result)
 
         return "No services found."
 
@@ -258,6 +273,28 @@ class ListServiceResourcesTool(BaseTool):
         return resources
 
 
+class DiagnoseServiceTool(BaseTool):
+    """Tool to diagnose a service."""
+
+    name = "diagnose_service"
+    description = (
+        "Diagnose a service. Use when you need to find out why a service is not working."
+        "Input should be id of a service."
+        "Output is status of the service and its resources, with logs around errors of unhealthy components."
+    )
+    walrus_client: WalrusClient
+
+    def _run(self, text: str) -> str:
+        project_id = walrus_context.GLOBAL_CONTEXT.project_id
+        environment_id = walrus_context.GLOBAL_CONTEXT.environment_id
+        try:
+            return diagnose_service(
+                self.walrus_client, project_id, environment_id, text.strip()
+            )
+        except Exception as e:
+            return e
+
+
 class GetServiceDependencyGraphTool(BaseTool):
     """Tool to get service dependency graph."""
 
@@ -287,8 +324,8 @@ class GetServiceResourceLogsTool(BaseTool):
         "Before using this tool, you should get keys of the resource first."
         'Input should be a json with 4 keys: "service_id", "service_resource_id", "key", "line_number".'
         '"key" is identity of a service resource\'s component. You can get available keys by listing service resources. '
-        '"line_number" is the number of lines of logs to get. defaults to 100 if user does not specify. '
-        "Output is log text."
+        '"line_number" is the max number of lines of logs to get. defaults to 100 if user does not specify. '
+        "Output is log lines around errors, or the last lines if there is no error."
     )
     walrus_client: WalrusClient
 
@@ -300,19 +337,24 @@ class GetServiceResourceLogsTool(BaseTool):
         service_id = input.get("service_id")
         service_resource_id = input.get("service_resource_id")
         key = input.get("key")
-        line_number = input.get("line_number", 100)
+        try:
+            line_number = int(input.get("line_number", 100))
+        except (TypeError, ValueError) as e:
+            return e
 
         project_id = walrus_context.GLOBAL_CONTEXT.project_id
         environment_id = walrus_context.GLOBAL_CONTEXT.environment_id
         try:
-            log = self.walrus_client.get_service_resource_logs(
+            # Scan more lines than returned to find errors in them.
+            lines = self.walrus_client.stream_service_resource_logs(
                 project_id,
                 environment_id,
                 service_id,
                 service_resource_id,
                 key,
-                line_number,
+                max(line_number, DIAGNOSE_LOG_SCAN_LINES),
             )
+            log = "\n".join(logs.error_excerpt(lines, line_number))
         except Exception as e:
             return e
 
@@ -327,9 +369,11 @@ class GetServiceResourceLogsReturnDirectTool(BaseTool):
     description = (
         "Get logs of a service resource. The logs will be shown to users directly. Useful when users want to see logs."
         "Before using this tool, you should get keys of the resource first."
-        'Input should be a json with 4 keys: "service_id", "service_resource_id", "key", "line_number".'
+        'Input should be a json with 6 keys: "service_id", "service_resource_id", "key", "line_number", "follow", "filter".'
         '"key" is identity of a service resource\'s component. You can get available keys by listing service resources. '
         '"line_number" is the number of lines of logs to get. defaults to 100 if user does not specify. '
+        '"follow" is a boolean, set to true when users want to keep watching new logs. '
+        '"filter" is an optional regex, only lines matching it are shown. '
         "Output is log text."
     )
     walrus_client: WalrusClient
@@ -342,25 +386,59 @@ class GetServiceResourceLogsReturnDirectTool(BaseTool):
         service_id = input.get("service_id")
         service_resource_id = input.get("service_resource_id")
         key = input.get("key")
-        line_number = input.get("line_number", 100)
+        follow = str(input.get("follow", False)).lower() in (
+            "true",
+            "1",
+            "yes",
+        )
+        pattern = input.get("filter") or None
+        try:
+            line_number = int(input.get("line_number", 100))
+        except (TypeError, ValueError) as e:
+            return e
 
         project_id = walrus_context.GLOBAL_CONTEXT.project_id
         environment_id = walrus_context.GLOBAL_CONTEXT.environment_id
+        lines = None
         try:
-            log = self.walrus_client.get_service_resource_logs(
+            lines = self.walrus_client.stream_service_resource_logs(
                 project_id,
                 environment_id,
                 service_id,
                 service_resource_id,
                 key,
                 line_number,
+                follow=follow,
             )
+            if follow:
+                return self.follow(lines, pattern)
+            log = "\n".join(logs.tail(lines, line_number, pattern))
         except Exception as e:
             return e
+        finally:
+            # Release the response if the lines are not read to the end.
+            if lines is not None:
+                lines.close()
 
         prefix = text.get("resource_log_prefix")
         return f"{prefix}\n```{log}```"
 
+    def follow(self, lines, pattern) -> str:
+        """Print log lines as they come until users halt."""
+        regex = re.compile(pattern) if pattern else None
+        click.echo(text.get("watch_service_note"))
+        try:
+            for line in lines:
+                if regex is None or regex.search(line):
+                    click.echo(line)
+        except KeyboardInterrupt:
+            # Ctrl+C detected. Stopping the request.
+            print("")
+        finally:
+            lines.close()
+
+        return text.get("watch_service_ending")
+
 
 class ConstructServiceToCreateTool(BaseTool):
     """Construct a service for deployment in Walrus system."""
@@ -387,20 +465,29 @@ class ConstructServiceToCreateTool(BaseTool):
 
         project_id = walrus_context.GLOBAL_CONTEXT.project_id
         environment_id = walrus_context.GLOBAL_CONTEXT.environment_id
-        existing_services = self.walrus_client.list_services(
-            project_id, environment_id
-        )
-        related_template = self.walrus_client.get_template_version(
-            template_name
-        )
+        # Gather prompt inputs concurrently.
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            existing_services_future = executor.submit(
+                existing_services_context,
+                self.walrus_client,
+                project_id,
+                environment_id,
+            )
+            related_template_future = executor.submit(
+                self.walrus_client.get_template_version, template_name
+            )
+            existing_services = existing_services_future.result()
+            related_template = related_template_future.result()
 
         prompt = PromptTemplate(
             template=CONSTRUCT_SERVICE_TO_CREATE_PROMPT,
             input_variables=["query"],
             partial_variables={
                 "context": json.dumps(walrus_context.GLOBAL_CONTEXT.__dict__),
-                "existing_services": json.dumps(existing_services),
-                "related_template": json.dumps(related_template),
+                "existing_services": existing_services,
+                "related_template": compact_template_version(
+                    related_template, query
+                ),
             },
         )
         chain = LLMChain(llm=self.llm, prompt=prompt)
@@ -434,14 +521,19 @@ class ConstructServiceToUpdateTool(BaseTool):
 
         project_id = walrus_context.GLOBAL_CONTEXT.project_id
         environment_id = walrus_context.GLOBAL_CONTEXT.environment_id
-        related_template = self.walrus_client.get_template_version(
-            template_name
-        )
-        current_service = self.walrus_client.get_service_by_name(
-            project_id=project_id,
-            environment_id=environment_id,
-            service_name=service_name,
-        )
+        # Gather prompt inputs concurrently.
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            related_template_future = executor.submit(
+                self.walrus_client.get_template_version, template_name
+            )
+            current_service_future = executor.submit(
+                self.walrus_client.get_service_by_name,
+                project_id=project_id,
+                environment_id=environment_id,
+                service_name=service_name,
+            )
+            related_template = related_template_future.result()
+            current_service = current_service_future.result()
 
         prompt = PromptTemplate(
             template=CONSTRUCT_SERVICE_TO_UPDATE_PROMPT,
@@ -449,7 +541,9 @@ class ConstructServiceToUpdateTool(BaseTool):
             partial_variables={
                 "context": json.dumps(walrus_context.GLOBAL_CONTEXT.__dict__),
                 "current_service": json.dumps(current_service),
-                "related_template": json.dumps(related_template),
+                "related_template": compact_template_version(
+                    related_template, query
+                ),
             },
         )
         chain = LLMChain(llm=self.llm, prompt=prompt)
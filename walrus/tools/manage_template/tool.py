@@ -1,12 +1,54 @@
 import json
+import re
 from langchain import LLMChain
 
 from langchain.agents.tools import BaseTool
 from langchain.prompts import PromptTemplate
 from langchain.schema.language_model import BaseLanguageModel
+from utils.search import BM25Index, tokenize
 from walrus.tools.manage_template.prompt import FIND_TEMPLATE_PROMPT
 from walrus.client import WalrusClient
 
+# Number of candidate templates sent to the LLM.
+CANDIDATE_TEMPLATES = 10
+
+
+def template_document(template: dict) -> str:
+    """Text of a template to index, including its variable names if the
+    template comes with a schema. The name is repeated to weigh more."""
+    name = template.get("name", "")
+    fields = [name, name, template.get("description") or ""]
+    schema = template.get("schema") or {}
+    for variable in schema.get("variables") or []:
+        fields.append(variable.get("name", ""))
+    return " ".join(fields)
+
+
+def find_named_template(query: str, templates: list[dict]):
+    """Get the template named in the query, if no other template could be
+    meant. e.g., "mysql" is not picked for "mysql on aws rds" when there is
+    an "aws-rds-mysql" template."""
+    lower_query = query.lower()
+    query_tokens = set(tokenize(query))
+    named = []
+    mentioned = []
+    for template in templates:
+        name = template["name"].lower()
+        if re.search(
+            r"(?<![\w-])" + re.escape(name) + r"(?![\w-])", lower_query
+        ):
+            named.append(template)
+        if query_tokens.issuperset(tokenize(name)):
+            mentioned.append(set(tokenize(name)))
+
+    if len(named) != 1:
+        return None
+    # Templates with names contained in the named one do not count.
+    named_tokens = set(tokenize(named[0]["name"]))
+    if any(not tokens.issubset(named_tokens) for tokens in mentioned):
+        return None
+    return named[0]
+
 
 class MatchTemplateTool(BaseTool):
     """Find matching template useful for a deployment task.
@@ -29,6 +71,18 @@ class MatchTemplateTool(BaseTool):
         except Exception as e:
             return e
 
+        # Skip the LLM when the query names a template.
+        named_template = find_named_template(query, templates)
+        if named_template is not None:
+            return f'"{named_template["name"]}"'
+
+        # Only send the best lexical matches to the LLM. Fall back to all
+        # templates when nothing matches lexically.
+        index = BM25Index(templates, [template_document(t) for t in templates])
+        candidates = index.search(query, CANDIDATE_TEMPLATES)
+        if len(candidates) > 0:
+            templates = [template for template, _ in candidates]
+
         prompt = PromptTemplate(
             template=FIND_TEMPLATE_PROMPT,
             input_variables=["query"],
@@ -57,4 +111,4 @@ class GetTemplateSchemaTool(BaseTool):
         except Exception as e:
             return e
 
-        return template_version
+        return json.dumps(template_version)